@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Screenshot Archive Benchmark
+Runs the same frames through the per-frame storage path of both session
+storage modes and compares them: "png" saves a PNG per frame (capture) and
+reads its bytes back for the model (analysis); "archive" appends the frame
+to a frame_archive.py archive and analysis reads a PNG back from it
+(frame_archive.archived_png, a keyframe's stored PNG or a decoded delta
+frame). Also compares storage size and random-access read latency.
+
+Frames come from a recording (directory, .zip or .tar of PNGs) or, with
+--synthetic N, from a generated desktop session: a text editor being typed
+into with a blinking cursor, occasional scrolling and an occasional switch
+to another window.
+
+Usage:
+    python benchmark_archive.py screenshots/ [--reads 200]
+    python benchmark_archive.py --synthetic 600
+"""
+
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+import numpy as np
+from PIL import Image, ImageDraw
+from utils import save_screenshot, resize_to_1536x864
+from frame_sources import ReplayFrameSource
+from frame_archive import ArchiveWriter, ArchiveReader, archive_size, KEYFRAME_INTERVAL
+
+SIZE = (1536, 864)
+WORDS = ["def", "return", "frame", "archive", "tile", "delta", "self", "import", "numpy", "index",
+         "timestamp", "chunk", "keyframe", "=", "(", ")", "if", "for", "in", "None"]
+
+def synthetic_frames(count, seed=42):
+    """Frames of a generated editing session, one every 5 seconds"""
+    rng = random.Random(seed)
+    lines = [" ".join(rng.choices(WORDS, k=rng.randint(3, 10))) for _ in range(40)]
+    window = 0
+    for i in range(count):
+        if rng.random() < 0.02:
+            window = 1 - window  # Switch applications: most of the screen changes
+        elif rng.random() < 0.05:
+            lines = lines[3:] + [" ".join(rng.choices(WORDS, k=rng.randint(3, 10))) for _ in range(3)]
+        else:
+            lines[-1] += " " + rng.choice(WORDS)
+            if len(lines[-1]) > 90:
+                lines.append("")
+                lines = lines[-40:]
+
+        image = Image.new("RGB", SIZE, (30, 30, 30) if window == 0 else (236, 236, 236))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([0, 0, SIZE[0], 28], fill=(50, 50, 55))
+        draw.text((12, 8), f"editor.py - window {window}    {i * 5 // 60:02d}:{i * 5 % 60:02d}", fill=(200, 200, 200))
+        draw.rectangle([0, 28, 240, SIZE[1]], fill=(40, 40, 45) if window == 0 else (220, 220, 225))
+        for n, line in enumerate(lines):
+            draw.text((260, 40 + n * 20), line, fill=(212, 212, 212) if window == 0 else (20, 20, 20))
+        if i % 2:
+            cursor_x = 260 + 6 * len(lines[-1])
+            draw.rectangle([cursor_x, 40 + (len(lines) - 1) * 20, cursor_x + 2, 54 + (len(lines) - 1) * 20], fill=(255, 255, 255))
+        yield image
+
+def recorded_frames(path):
+    source = ReplayFrameSource(path, speed=0)
+    try:
+        while True:
+            image = source.grab()
+            if image is None:
+                break
+            yield resize_to_1536x864(image) if image.size != SIZE else image
+    finally:
+        source.close()
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def run_benchmark(frames, reads):
+    directory = tempfile.mkdtemp(prefix="bench_archive_")
+    png_dir = os.path.join(directory, "png")
+    archive_dir = os.path.join(directory, "archive")
+    os.makedirs(png_dir)
+    results = {"png_write": [], "archive_write": [], "kinds": {"key": 0, "delta": 0}}
+    names = []
+
+    try:
+        writer = ArchiveWriter(archive_dir, "bench")
+        for i, image in enumerate(frames):
+            name = f"bench_{1_700_000_000 + i * 5}_{i + 1}.png"
+            names.append(name)
+
+            start = time.monotonic()
+            save_screenshot(image, os.path.join(png_dir, name))
+            results["png_write"].append(time.monotonic() - start)
+
+            start = time.monotonic()
+            record = writer.add(image, timestamp=(1_700_000_000 + i * 5) * 1000, name=name)
+            results["archive_write"].append(time.monotonic() - start)
+            results["kinds"][record["kind"]] += 1
+        writer.close()
+
+        results["frames"] = len(names)
+        results["png_bytes"] = sum(os.path.getsize(os.path.join(png_dir, n)) for n in names)
+        results["archive_bytes"] = archive_size(archive_dir)
+
+        # Analysis load, in capture order as the analysis workers read frames
+        reader = ArchiveReader(archive_dir)
+        results["png_load"], results["archive_load"] = [], []
+        for name in names:
+            start = time.monotonic()
+            with open(os.path.join(png_dir, name), 'rb') as f:
+                f.read()
+            results["png_load"].append(time.monotonic() - start)
+
+            start = time.monotonic()
+            reader.png(name)
+            results["archive_load"].append(time.monotonic() - start)
+
+        # Random access: each read is a fresh lookup of a random frame
+        rng = random.Random(7)
+        picks = [rng.randrange(len(names)) for _ in range(reads)]
+        results["png_read"], results["archive_read"] = [], []
+        for i in picks:
+            start = time.monotonic()
+            Image.open(os.path.join(png_dir, names[i])).convert("RGB")
+            results["png_read"].append(time.monotonic() - start)
+
+            reader._last = None  # No help from the previous read
+            start = time.monotonic()
+            _, image = reader.read((1_700_000_000 + i * 5) * 1000, "bench")
+            results["archive_read"].append(time.monotonic() - start)
+
+        # Lossless: a sample of frames reads back pixel-identical
+        results["identical"] = all(
+            np.array_equal(np.asarray(reader.read_name(names[i])),
+                           np.asarray(Image.open(os.path.join(png_dir, names[i])).convert("RGB")))
+            for i in sorted(set(picks))[:20])
+        reader.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+def generate_markdown(source, results):
+    frames = results["frames"]
+    png_mb = results["png_bytes"] / 1024 / 1024
+    archive_mb = results["archive_bytes"] / 1024 / 1024
+    markdown = "# Screenshot Archive Benchmark Results\n\n"
+    markdown += f"Test conducted at: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    markdown += f"- Frames: {frames} from {source} ({results['kinds']['key']} keyframes, "
+    markdown += f"{results['kinds']['delta']} deltas, keyframe every {KEYFRAME_INTERVAL})\n"
+    markdown += f"- Archive reads back pixel-identical: {'yes' if results['identical'] else 'NO'}\n\n"
+    markdown += "| Measurement | PNG per frame | Archive | Change |\n"
+    markdown += "|-------------|---------------|---------|--------|\n"
+    markdown += f"| Storage (MB) | {png_mb:.1f} | {archive_mb:.1f} | {(archive_mb / png_mb - 1) * 100:+.1f}% |\n"
+    markdown += f"| Storage per frame (KB) | {png_mb * 1024 / frames:.1f} | {archive_mb * 1024 / frames:.1f} | |\n"
+    for label, key in (("Capture write (ms/frame)", "write"), ("Analysis load (ms/frame)", "load")):
+        png_ms = statistics.mean(results[f"png_{key}"]) * 1000
+        archive_ms = statistics.mean(results[f"archive_{key}"]) * 1000
+        change = f"{(archive_ms / png_ms - 1) * 100:+.1f}%" if png_ms >= 1 else ""
+        markdown += f"| {label} | {png_ms:.1f} | {archive_ms:.1f} | {change} |\n"
+    png_rate = frames / (sum(results["png_write"]) + sum(results["png_load"]))
+    archive_rate = frames / (sum(results["archive_write"]) + sum(results["archive_load"]))
+    markdown += f"| Pipeline throughput, write + load (frames/s) | {png_rate:.1f} | {archive_rate:.1f} | {(archive_rate / png_rate - 1) * 100:+.1f}% |\n"
+    for label, fraction in (("p50", 0.5), ("p95", 0.95)):
+        png_ms = percentile(results["png_read"], fraction) * 1000
+        archive_ms = percentile(results["archive_read"], fraction) * 1000
+        markdown += f"| Random read {label} (ms) | {png_ms:.1f} | {archive_ms:.1f} | {(archive_ms / png_ms - 1) * 100:+.1f}% |\n"
+    png_max, archive_max = max(results["png_read"]) * 1000, max(results["archive_read"]) * 1000
+    markdown += f"| Random read max (ms) | {png_max:.1f} | {archive_max:.1f} | |\n"
+    markdown += f"| Random read mean (ms) | {statistics.mean(results['png_read']) * 1000:.1f} | "
+    markdown += f"{statistics.mean(results['archive_read']) * 1000:.1f} | |\n"
+    return markdown
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PNG-per-frame storage with the keyframe + delta archive")
+    parser.add_argument("path", nargs="?", help="Directory, .zip or .tar of recorded PNGs")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="Generate N frames of an editing session instead")
+    parser.add_argument("--reads", type=int, default=200, help="Random frame reads to time")
+    args = parser.parse_args()
+    if not args.path and not args.synthetic:
+        parser.error("give a recording path or --synthetic N")
+
+    source = f"`{args.path}`" if args.path else f"a synthetic session ({args.synthetic} frames)"
+    frames = recorded_frames(args.path) if args.path else synthetic_frames(args.synthetic)
+    print(f"⏱️ Benchmarking screenshot storage on {source}...")
+    results = run_benchmark(frames, args.reads)
+
+    markdown = generate_markdown(source, results)
+    results_filename = f"archive_results_{int(time.time())}.md"
+    with open(results_filename, 'w') as f:
+        f.write(markdown)
+
+    print(f"\nResults saved to: {results_filename}")
+    print("\n" + markdown)
+
+if __name__ == "__main__":
+    main()
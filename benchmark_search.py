@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Semantic Search Benchmark
+Builds a search_index.py index of synthetic screen analyses in a temporary
+directory and measures embedding throughput, append throughput and top-k
+query latency (one query per pass and batched queries per pass) at the
+requested size. Embedding a million texts in Python takes a while, so a
+pool of distinct texts is embedded once and its vectors are reused, with
+a little noise, to fill the matrix.
+
+Usage:
+    python benchmark_search.py [--rows 1000000] [--queries 50] [--batch 16] [-k 10]
+"""
+
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+import numpy as np
+from search_index import SearchIndex, embed, embed_batch
+
+APPS = ["VS Code", "Terminal", "Safari", "Chrome", "Slack", "Figma", "Xcode", "Notes", "Mail", "Finder"]
+SUBJECTS = ["web_app.py", "pull request #412", "release checklist", "pytest output", "quarterly report",
+            "dashboard header", "scheduler.py", "design review", "inbox", "memory.py", "build logs",
+            "flight booking", "API docs", "standup notes", "traceback in worker"]
+ACTIONS = ["editing", "reviewing", "scrolling through", "typing in", "reading", "debugging",
+           "searching", "comparing", "selecting text in", "running"]
+
+def synthetic_analysis(rng):
+    """A short screen analysis in the shape the vision model produces"""
+    app, other = rng.sample(APPS, 2)
+    subject, detail = rng.sample(SUBJECTS, 2)
+    return (f"SCREEN ELEMENTS: {app} window in front, {other} in the dock. "
+            f"ACTIONS: user {rng.choice(ACTIONS)} {subject}, cursor near {detail}. "
+            f"CONTENT: {subject} {detail} {rng.randint(1, 500)} lines visible")
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def run_benchmark(rows, pool_size, num_queries, batch, k, append_batch):
+    rng = random.Random(42)
+    noise = np.random.default_rng(42)
+    directory = tempfile.mkdtemp(prefix="bench_search_")
+    results = {}
+    try:
+        texts = [synthetic_analysis(rng) for _ in range(pool_size)]
+        start = time.monotonic()
+        pool = embed_batch(texts)
+        results["embed_per_sec"] = pool_size / (time.monotonic() - start)
+        print(f"🧮 Embedded {pool_size} texts ({results['embed_per_sec']:.0f}/s)")
+
+        index = SearchIndex(directory)
+        start = time.monotonic()
+        for first in range(0, rows, append_batch):
+            count = min(append_batch, rows - first)
+            vectors = pool[noise.integers(0, pool_size, count)]
+            vectors = vectors + noise.normal(0, 0.01, vectors.shape).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            index.append(np.arange(first + 1, first + count + 1), vectors)
+        results["append_per_sec"] = rows / (time.monotonic() - start)
+        print(f"💾 Appended {rows} rows ({results['append_per_sec']:.0f}/s, matrix capacity {index.capacity})")
+
+        queries = np.stack([embed(synthetic_analysis(rng)) for _ in range(num_queries)])
+        index.search(queries[:1], k)  # Fault the matrix into the page cache, untimed
+
+        single = []
+        for query in queries:
+            start = time.monotonic()
+            index.search(query, k)
+            single.append(time.monotonic() - start)
+        results["single"] = single
+
+        batched = []
+        for first in range(0, num_queries - batch + 1, batch):  # Full batches only
+            chunk = queries[first:first + batch]
+            start = time.monotonic()
+            index.search(chunk, k)
+            batched.append((time.monotonic() - start) / len(chunk))
+        results["batched"] = batched
+
+        # Same answers as a brute-force full sort, on the first query
+        found = [score for _, score in index.search(queries[0], k)[0]]
+        scores = np.asarray(index.vectors[:rows]) @ queries[0]
+        results["exact"] = bool(np.allclose(found, np.sort(scores)[::-1][:k]))
+        results["index_mb"] = (index.capacity * index.dim * 4 + index.capacity * 8) / 1024 / 1024
+        results["dim"] = index.dim
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+def generate_markdown(args, results):
+    single_ms = [t * 1000 for t in results["single"]]
+    batched_ms = [t * 1000 for t in results["batched"]]
+    markdown = "# Semantic Search Benchmark Results\n\n"
+    markdown += f"Test conducted at: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    markdown += f"- Rows: {args.rows:,}, dimensions: {results['dim']}, k: {args.k}, "
+    markdown += f"index files: {results['index_mb']:.0f}MB (float32 vectors + int64 ids)\n"
+    markdown += f"- Embedding: {results['embed_per_sec']:.0f} texts/s, append: {results['append_per_sec']:.0f} rows/s\n"
+    markdown += f"- Top-k matches a brute-force sort: {'yes' if results['exact'] else 'NO'}\n\n"
+    markdown += "| Query mode | Mean (ms/query) | p50 | p95 | Max |\n"
+    markdown += "|------------|-----------------|-----|-----|-----|\n"
+    for name, values in ((f"Single query per pass ({args.queries} queries)", single_ms),
+                         (f"Batched, {args.batch} queries per pass", batched_ms)):
+        markdown += (f"| {name} | {statistics.mean(values):.1f} | {percentile(values, 0.5):.1f} | "
+                     f"{percentile(values, 0.95):.1f} | {max(values):.1f} |\n")
+    return markdown
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure semantic search index throughput and query latency")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the index")
+    parser.add_argument("--pool", type=int, default=20_000, help="Distinct texts embedded to fill it")
+    parser.add_argument("--queries", type=int, default=50, help="Timed queries")
+    parser.add_argument("--batch", type=int, default=16, help="Queries scored per pass in batched mode")
+    parser.add_argument("-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--append-batch", type=int, default=10_000, help="Rows per append call")
+    args = parser.parse_args()
+
+    print(f"⏱️ Benchmarking semantic search at {args.rows:,} rows...")
+    results = run_benchmark(args.rows, args.pool, args.queries, args.batch, args.k, args.append_batch)
+
+    markdown = generate_markdown(args, results)
+    results_filename = f"search_results_{int(time.time())}.md"
+    with open(results_filename, 'w') as f:
+        f.write(markdown)
+
+    print(f"\nResults saved to: {results_filename}")
+    print("\n" + markdown)
+
+if __name__ == "__main__":
+    main()
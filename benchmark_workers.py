@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Worker Start/Stop Latency Benchmark
+Compares the old per-session capture process (spawn on start, join on stop)
+with a warm pre-forked capture worker from supervisor.py that is only
+assigned and released. Start latency is measured until the first
+"Capturing" status arrives, stop latency until the process has exited
+(cold) or reported itself idle (warm). Replays a recording so it runs on
+headless boxes.
+
+Usage:
+    python benchmark_workers.py screenshots/ [--runs 10] [--start-method spawn]
+"""
+
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+from workers import screenshot_worker
+from supervisor import WorkerSupervisor
+
+def wait_for(result_queue, predicate, timeout=60):
+    """Monotonic time at which a matching result queue message was read"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        message = result_queue.get(timeout=deadline - time.monotonic())
+        if predicate(message):
+            return time.monotonic()
+        if message["type"] == "error":
+            raise RuntimeError(message["message"])
+    raise TimeoutError("Worker did not answer")
+
+def is_capturing(message):
+    return message["type"] == "status" and "Capturing" in message["message"]
+
+def drain(queue):
+    while not queue.empty():
+        queue.get()
+
+def cold_cycle(config, frame_queue, result_queue):
+    """Previous behaviour: a new capture process per session, joined on stop"""
+    stop_event = multiprocessing.Event()
+    start = time.monotonic()
+    process = multiprocessing.Process(
+        target=screenshot_worker,
+        args=("bench", config, frame_queue, result_queue, stop_event)
+    )
+    process.start()
+    started = wait_for(result_queue, is_capturing) - start
+
+    stop = time.monotonic()
+    stop_event.set()
+    process.join(timeout=10)
+    stopped = time.monotonic() - stop
+    return started, stopped
+
+def warm_cycle(supervisor, config):
+    """Supervisor behaviour: assign a pre-forked worker, release it without waiting"""
+    start = time.monotonic()
+    supervisor.assign("bench", config)
+    started = wait_for(supervisor.result_queue, is_capturing) - start
+
+    stop = time.monotonic()
+    supervisor.release("bench")
+    call = time.monotonic() - stop
+    stopped = wait_for(supervisor.result_queue,
+                       lambda m: m["type"] == "worker_state" and m["state"] == "idle") - stop
+    return started, stopped, call
+
+def summarize(values):
+    values_ms = [v * 1000 for v in values]
+    return f"{statistics.mean(values_ms):.1f} | {statistics.median(values_ms):.1f} | {max(values_ms):.1f}"
+
+def run_benchmark(path, runs):
+    output_dir = tempfile.mkdtemp(prefix="bench_workers_")
+    config = {"source": "replay", "replay_path": path, "replay_speed": 0, "replay_loop": True,
+              "screenshot_dir": output_dir}
+    results = {"cold_start": [], "cold_stop": [], "warm_start": [], "warm_stop": [], "warm_call": []}
+
+    try:
+        frame_queue = multiprocessing.Queue()
+        result_queue = multiprocessing.Queue()
+        for i in range(runs):
+            started, stopped = cold_cycle(config, frame_queue, result_queue)
+            results["cold_start"].append(started)
+            results["cold_stop"].append(stopped)
+            drain(frame_queue)
+            drain(result_queue)
+            print(f"❄️  cold run {i + 1}/{runs}: start {started * 1000:.1f}ms, stop {stopped * 1000:.1f}ms")
+
+        supervisor = WorkerSupervisor(analysis_workers=0, capture_workers=1)
+        supervisor.start()
+        try:
+            # The supervisor forks at server start, long before the first session: warm up untimed
+            warm_cycle(supervisor, config)
+            drain(supervisor.frame_queue)
+            for i in range(runs):
+                started, stopped, call = warm_cycle(supervisor, config)
+                results["warm_start"].append(started)
+                results["warm_stop"].append(stopped)
+                results["warm_call"].append(call)
+                drain(supervisor.frame_queue)
+                print(f"🔥 warm run {i + 1}/{runs}: start {started * 1000:.1f}ms, stop {stopped * 1000:.1f}ms")
+        finally:
+            supervisor.shutdown()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+def generate_markdown(path, args, results):
+    markdown = "# Worker Start/Stop Latency Results\n\n"
+    markdown += f"Test conducted at: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    markdown += f"- Source: `{path}`, {args.runs} runs, start method: `{multiprocessing.get_start_method()}`\n"
+    markdown += "- Start: command until the first \"Capturing\" status; stop: command until the process exited (cold) or idled (warm)\n\n"
+    markdown += "| Measurement | Mean (ms) | Median (ms) | Max (ms) |\n"
+    markdown += "|-------------|-----------|-------------|----------|\n"
+    markdown += f"| Cold start (spawn process) | {summarize(results['cold_start'])} |\n"
+    markdown += f"| Warm start (assign) | {summarize(results['warm_start'])} |\n"
+    markdown += f"| Cold stop (event + join) | {summarize(results['cold_stop'])} |\n"
+    markdown += f"| Warm stop (release until idle) | {summarize(results['warm_stop'])} |\n"
+    markdown += f"| Warm stop call (handler blocked) | {summarize(results['warm_call'])} |\n"
+    return markdown
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold vs warm capture worker start/stop latency")
+    parser.add_argument("path", nargs="?", default="screenshots", help="Directory, .zip or .tar of recorded PNGs")
+    parser.add_argument("--runs", type=int, default=10, help="Start/stop cycles per mode")
+    parser.add_argument("--start-method", choices=["fork", "spawn", "forkserver"],
+                        help="multiprocessing start method (spawn is the macOS default)")
+    args = parser.parse_args()
+    if args.start_method:
+        multiprocessing.set_start_method(args.start_method)
+
+    print(f"⏱️ Measuring worker start/stop latency ({multiprocessing.get_start_method()})...")
+    results = run_benchmark(args.path, args.runs)
+
+    markdown = generate_markdown(args.path, args, results)
+    results_filename = f"worker_results_{int(time.time())}.md"
+    with open(results_filename, 'w') as f:
+        f.write(markdown)
+
+    print(f"\nResults saved to: {results_filename}")
+    print("\n" + markdown)
+
+if __name__ == "__main__":
+    main()
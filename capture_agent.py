@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Remote Capture Agent
+Capture-only process for a workstation: grabs (or replays) frames, resizes
+and encodes them locally, and pushes them to a central dashboard server as
+binary Socket.IO attachments. The server runs the shared analysis pool.
+
+Backpressure: at most --window frames may be unacknowledged; a frame that
+comes due while the window is full is skipped, and so is the next one when
+the server reports its queue for this agent is full. A frame only counts as
+sent once the server acknowledges it; frames the server refuses, frames
+lost with a dropped connection and frames over the server's size limit
+(MAX_FRAME_MB) count as failed.
+
+The server only accepts agents that present its AGENT_TOKEN. Every
+BASELINE_EVERY frames the agent also measures what the same frame would
+have cost as a PNG inside a base64 JSON message, so the dashboard can report
+measured savings of the binary channel and of the codec separately.
+
+Usage:
+    AGENT_TOKEN=secret python capture_agent.py http://server:8080 --agent-id laptop-1 [--format webp --quality 80]
+"""
+
+import os
+import json
+import time
+import base64
+import socket
+import argparse
+import threading
+import socketio
+from utils import resize_to_1536x864, encode_image
+from frame_sources import make_frame_source
+
+NAMESPACE = '/agent'
+BASELINE_EVERY = 10  # Measure the base64 JSON baseline on every Nth frame
+MAX_FRAME_BYTES = 8 * 1024 * 1024  # Until the server says otherwise in its agent_hello ack
+
+def base64_json_size(png_bytes, fields):
+    """Size of the frame sent the old way: a base64 PNG string inside a JSON message"""
+    payload = dict(fields, image=base64.b64encode(png_bytes).decode('ascii'))
+    return len(json.dumps(payload).encode())
+
+class CaptureAgent:
+    """Push encoded frames to the dashboard server over one persistent connection"""
+
+    def __init__(self, server_url, agent_id, config, image_format="png", quality=85, window=2, token=None):
+        self.server_url = server_url
+        self.agent_id = agent_id
+        self.token = token
+        self.config = config
+        self.image_format = image_format
+        self.quality = quality
+        self.window = threading.BoundedSemaphore(window)
+        self.window_size = window
+        self.unacked = 0
+        self.stop_event = threading.Event()
+        self.registered = threading.Event()
+        self.skip_next = False
+        self.max_frame_bytes = MAX_FRAME_BYTES
+        self.lock = threading.Lock()
+        self.stats = {"sent": 0, "failed": 0, "skipped": 0, "dropped_by_server": 0,
+                      "bytes_sent": 0, "start_time": None,
+                      "sampled_bytes": 0, "sampled_png_bytes": 0, "sampled_json_bytes": 0}
+
+        self.sio = socketio.Client(reconnection=True, reconnection_delay=1, reconnection_delay_max=30)
+        self.sio.on('connect', self._on_connect, namespace=NAMESPACE)
+        self.sio.on('disconnect', self._on_disconnect, namespace=NAMESPACE)
+        self.sio.on('agent_stop', self._on_stop, namespace=NAMESPACE)
+
+    def _on_connect(self):
+        # Runs on the first connect and after every automatic reconnect
+        hello = {"agent_id": self.agent_id, "token": self.token}
+        hello.update({k: self.config[k] for k in ("weight", "max_pending", "max_in_flight") if k in self.config})
+        self.sio.emit('agent_hello', hello, namespace=NAMESPACE, callback=self._on_registered)
+
+    def _on_registered(self, ack):
+        if ack and ack.get("ok"):
+            print(f"🛰️ Registered with {self.server_url} as session {ack['session_id']}")
+            self.max_frame_bytes = ack.get("max_frame_bytes", MAX_FRAME_BYTES)
+            self.registered.set()
+        else:
+            print(f"❌ Registration refused: {(ack or {}).get('error')}")
+            self.stop_event.set()
+
+    def _on_disconnect(self, *args):
+        self.registered.clear()
+        # Acks for frames in flight are lost with the connection, so free the window;
+        # the server may never have stored those frames
+        with self.lock:
+            for _ in range(self.unacked):
+                self.window.release()
+            self.stats["failed"] += self.unacked
+            self.unacked = 0
+        if not self.stop_event.is_set():
+            print("📴 Disconnected, reconnecting...")
+
+    def _on_stop(self, data=None):
+        print("🛑 Server stopped this session")
+        self.stop_event.set()
+
+    def _on_ack(self, ack, num_bytes, baseline=None):
+        with self.lock:
+            if self.unacked == 0:
+                return  # Window already reset by a disconnect
+            self.unacked -= 1
+            self.window.release()
+            if not ack or not ack.get("ok"):
+                self.stats["failed"] += 1
+                print(f"❌ Server refused a frame: {(ack or {}).get('error')}")
+                return
+            self.stats["sent"] += 1
+            self.stats["bytes_sent"] += num_bytes
+            if baseline:
+                self.stats["sampled_bytes"] += num_bytes
+                self.stats["sampled_png_bytes"] += baseline["png_bytes"]
+                self.stats["sampled_json_bytes"] += baseline["json_bytes"]
+            if ack.get("dropped"):
+                self.stats["dropped_by_server"] += 1
+            # Server queue for this agent is full - give it one interval to catch up
+            if ack.get("pending", 0) >= ack.get("max_pending", self.window_size):
+                self.skip_next = True
+
+    def send_frame(self, screenshot_num, image, timings, baseline=None):
+        """Non-blocking send; returns False if the frame was skipped for backpressure or too large"""
+        if len(image) > self.max_frame_bytes:
+            # The server would drop the whole connection over it
+            self.stats["failed"] += 1
+            print(f"❌ Frame #{screenshot_num} is {len(image) / 1024 / 1024:.2f}MB, over the server's "
+                  f"{self.max_frame_bytes / 1024 / 1024:g}MB limit: use --format webp or jpeg, "
+                  f"or raise MAX_FRAME_MB on the server")
+            return False
+        if not self.registered.is_set() or not self.window.acquire(blocking=False):
+            self.stats["skipped"] += 1
+            return False
+        with self.lock:
+            self.unacked += 1
+
+        payload = {"screenshot_num": screenshot_num, "image": image, "timings": timings}
+        if baseline:
+            payload["baseline"] = baseline
+        try:
+            self.sio.emit('agent_frame', payload, namespace=NAMESPACE,
+                          callback=lambda ack: self._on_ack(ack, len(image), baseline))
+        except socketio.exceptions.BadNamespaceError:
+            with self.lock:
+                if self.unacked:
+                    self.unacked -= 1
+                    self.window.release()
+            self.stats["skipped"] += 1
+            return False
+        return True
+
+    def measure_baseline(self, screenshot_num, resized_screenshot, image, timings):
+        """PNG and base64-PNG JSON sizes of this frame, for the savings report"""
+        png_bytes = image if self.image_format == "png" else encode_image(resized_screenshot, "png")
+        fields = {"screenshot_num": screenshot_num, "timings": timings}
+        return {"png_bytes": len(png_bytes), "json_bytes": base64_json_size(png_bytes, fields)}
+
+    def print_stats(self):
+        elapsed = max(time.time() - self.stats["start_time"], 1e-9)
+        sent = self.stats["bytes_sent"]
+        savings = ""
+        if self.stats["sampled_json_bytes"]:
+            binary = (1 - self.stats["sampled_png_bytes"] / self.stats["sampled_json_bytes"]) * 100
+            codec = (1 - self.stats["sampled_bytes"] / self.stats["sampled_png_bytes"]) * 100
+            savings = f", binary vs base64 JSON -{binary:.1f}%, {self.image_format} vs png -{codec:.1f}%"
+        print(f"📊 {self.stats['sent']} frames sent ({self.stats['sent'] / elapsed:.2f}/s), "
+              f"{sent / 1024:.1f}KB ({sent / 1024 / elapsed:.1f}KB/s{savings}), "
+              f"{self.stats['failed']} failed, {self.stats['skipped']} skipped, "
+              f"{self.stats['dropped_by_server']} dropped by server")
+
+    def connect(self):
+        """Connect once, retrying with exponential backoff until the server answers"""
+        delay = 1
+        while not self.stop_event.is_set():
+            try:
+                self.sio.connect(self.server_url, namespaces=[NAMESPACE], auth={"token": self.token}, wait_timeout=10)
+                return True
+            except socketio.exceptions.ConnectionError as e:
+                print(f"📴 Cannot reach {self.server_url} ({e}), retrying in {delay}s...")
+                self.stop_event.wait(delay)
+                delay = min(delay * 2, 30)
+        return False
+
+    def run(self):
+        self.stats["start_time"] = time.time()
+        if not self.connect():
+            return
+        source = make_frame_source(self.config)
+        screenshot_count = 0
+        last_report = time.time()
+
+        try:
+            while not self.stop_event.is_set():
+                # Hold captures while (re)connecting
+                if not self.registered.wait(0.5):
+                    continue
+                if not source.wait(self.stop_event):
+                    break
+                if source.finished:
+                    print("🏁 Replay finished")
+                    break
+
+                capture_start = time.monotonic()
+                screenshot = source.grab()
+                if self.skip_next:
+                    self.skip_next = False
+                    self.stats["skipped"] += 1
+                    continue
+                resize_start = time.monotonic()
+                resized_screenshot = resize_to_1536x864(screenshot)
+                encode_start = time.monotonic()
+                image = encode_image(resized_screenshot, self.image_format, self.quality)
+                encode_end = time.monotonic()
+
+                screenshot_count += 1
+                timings = {
+                    "capture": resize_start - capture_start,
+                    "resize": encode_start - resize_start,
+                    "encode": encode_end - encode_start
+                }
+                baseline = None
+                if screenshot_count % BASELINE_EVERY == 1:
+                    baseline = self.measure_baseline(screenshot_count, resized_screenshot, image, timings)
+                self.send_frame(screenshot_count, image, timings, baseline)
+
+                if time.time() - last_report >= 30:
+                    self.print_stats()
+                    last_report = time.time()
+        finally:
+            source.close()
+            # Give in-flight frames a moment to be acknowledged before leaving
+            deadline = time.time() + 5
+            while self.unacked and time.time() < deadline:
+                time.sleep(0.05)
+            self.print_stats()
+            self.stop_event.set()
+            self.sio.disconnect()
+
+def main():
+    parser = argparse.ArgumentParser(description="Push screen captures to a central analysis server")
+    parser.add_argument("server", nargs="?", default=os.getenv('AGENT_SERVER', 'http://localhost:8080'))
+    parser.add_argument("--agent-id", default=socket.gethostname(), help="Session id on the server (default: hostname)")
+    parser.add_argument("--monitor", type=int, default=1, help="MSS monitor index to capture")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between captures")
+    parser.add_argument("--replay", metavar="PATH", help="Replay recorded screenshots instead of capturing the screen")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Replay speed multiplier (0 = as fast as possible)")
+    parser.add_argument("--format", choices=["png", "webp", "jpeg"], default="png", help="Frame encoding")
+    parser.add_argument("--quality", type=int, default=85, help="WebP/JPEG quality (WebP 100 = lossless)")
+    parser.add_argument("--window", type=int, default=2, help="Max unacknowledged frames in flight")
+    parser.add_argument("--weight", type=float, default=1.0, help="Fair-share weight on the server")
+    parser.add_argument("--max-pending", type=int, default=5, help="Frames the server may queue for this agent")
+    parser.add_argument("--token", default=os.getenv('AGENT_TOKEN'), help="Shared token the server expects (default: $AGENT_TOKEN)")
+    args = parser.parse_args()
+    if not args.token:
+        parser.error("the server requires a shared token: set AGENT_TOKEN or pass --token")
+
+    config = {
+        "source": "replay" if args.replay else "live",
+        "monitor": args.monitor,
+        "interval": args.interval,
+        "replay_path": args.replay,
+        "replay_speed": args.replay_speed,
+        "weight": args.weight,
+        "max_pending": args.max_pending
+    }
+    agent = CaptureAgent(args.server, args.agent_id, config, args.format, args.quality, args.window, args.token)
+
+    print(f"🚀 Capture agent {args.agent_id} → {args.server} ({args.format}, window {args.window})")
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping capture agent...")
+        agent.stop_event.set()
+
+if __name__ == "__main__":
+    main()
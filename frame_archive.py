@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Screenshot archive: keyframes plus tile deltas
+Consecutive captures are mostly identical, so a stream of frames is stored
+as groups: a PNG keyframe, then up to KEYFRAME_INTERVAL - 1 deltas. A
+delta lists the TILE x TILE tiles that changed since the previous frame
+and their pixels XORed with the old ones (zero wherever nothing moved),
+zlib-compressed. Frames are lossless RGB.
+
+Records are appended to chunk files of CHUNK_GROUPS groups each; a group
+never spans two chunks. ARCHIVE_DIR/index.sqlite maps every frame (stream,
+timestamp in ms, original file name) to its chunk, byte range and the
+offset of its group's keyframe, so reading any frame is one indexed lookup,
+one file read and at most one keyframe plus KEYFRAME_INTERVAL - 1 deltas
+to decode.
+
+Usage:
+    python frame_archive.py migrate screenshots/ [--delete]   # archive existing PNGs
+    python frame_archive.py extract <stream> <timestamp_ms> out.png
+    python frame_archive.py stats
+"""
+
+import io
+import os
+import re
+import time
+import zlib
+import sqlite3
+import argparse
+import threading
+from contextlib import closing
+import numpy as np
+from PIL import Image
+from frame_sources import FILENAME_TIMESTAMP
+
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'screenshots/archive')
+
+TILE = 32               # Tile edge in pixels (1536x864 = 48x27 tiles)
+KEYFRAME_INTERVAL = 30  # Frames per group: 2.5 minutes at one capture every 5 seconds
+CHUNK_GROUPS = 8        # Groups per chunk file
+DELTA_LEVEL = 6         # zlib level for deltas
+
+def connect(directory=ARCHIVE_DIR):
+    """Open the archive index, creating the directory and schema if missing"""
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(directory, "index.sqlite"), timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # WAL lets the web server read while capture processes append; commits need no fsync
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS frames (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stream TEXT NOT NULL,
+            name TEXT UNIQUE,
+            timestamp INTEGER NOT NULL,
+            chunk TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            key_offset INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            tiles INTEGER NOT NULL DEFAULT 0,
+            width INTEGER NOT NULL,
+            height INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_frames_stream_timestamp ON frames(stream, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_frames_chunk_offset ON frames(chunk, offset);
+    """)
+    return conn
+
+def to_tiles(pixels, tile=TILE):
+    """(height, width, 3) pixels as (tile count, tile, tile, 3), zero-padded to whole tiles"""
+    height, width, channels = pixels.shape
+    pad_h, pad_w = -height % tile, -width % tile
+    if pad_h or pad_w:
+        pixels = np.pad(pixels, ((0, pad_h), (0, pad_w), (0, 0)))
+    rows, cols = pixels.shape[0] // tile, pixels.shape[1] // tile
+    return np.ascontiguousarray(pixels.reshape(rows, tile, cols, tile, channels).swapaxes(1, 2)).reshape(-1, tile, tile, channels)
+
+def from_tiles(tiles, width, height, tile=TILE):
+    """Inverse of to_tiles, as an RGB image"""
+    rows, cols = -(-height // tile), -(-width // tile)
+    pixels = tiles.reshape(rows, cols, tile, tile, 3).swapaxes(1, 2).reshape(rows * tile, cols * tile, 3)
+    return Image.fromarray(np.ascontiguousarray(pixels[:height, :width]), "RGB")
+
+def encode_delta(tiles, previous):
+    """Changed tile indices and XOR residuals in one zlib blob, returns (blob, changed tile count)"""
+    changed = np.flatnonzero((tiles != previous).any(axis=(1, 2, 3)))
+    residual = tiles[changed] ^ previous[changed]
+    return zlib.compress(changed.astype('<u2').tobytes() + residual.tobytes(), DELTA_LEVEL), len(changed)
+
+def apply_delta(tiles, blob, count):
+    """Update a frame's tiles in place with a delta from encode_delta"""
+    data = zlib.decompress(blob)
+    changed = np.frombuffer(data, dtype='<u2', count=count)
+    tiles[changed] ^= np.frombuffer(data, dtype=np.uint8, offset=2 * count).reshape(count, *tiles.shape[1:])
+
+def stream_name(stream):
+    """Stream ids become chunk file names, so keep them to safe characters"""
+    return re.sub(r'[^A-Za-z0-9_-]', '_', str(stream)) or "default"
+
+class ArchiveWriter:
+    """Append frames of one stream (a capture session) to the archive
+
+    One writer per stream at a time; a new writer always starts a new chunk
+    with a keyframe, so it never needs the previous writer's state.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, stream="default", keyframe_interval=KEYFRAME_INTERVAL,
+                 chunk_groups=CHUNK_GROUPS):
+        self.directory = directory
+        self.stream = stream_name(stream)
+        self.keyframe_interval = keyframe_interval
+        self.chunk_groups = chunk_groups
+        self.conn = connect(directory)
+        self.chunk = None
+        self.file = None
+        self.groups = 0          # Groups started in the current chunk
+        self.group_frames = 0    # Frames in the current group
+        self.key_offset = 0
+        self.previous = None     # Tiles of the last frame written
+
+    def _next_chunk(self):
+        if self.file:
+            self.file.close()
+        self.chunk = f"{self.stream}-{time.time_ns() // 1000}.chunk"
+        self.file = open(os.path.join(self.directory, self.chunk), 'ab')
+        self.groups = 0
+
+    def add(self, image, timestamp=None, name=None):
+        """Archive one frame, returns its record {"kind": "key"|"delta", "bytes", "tiles"}"""
+        image = image.convert("RGB")
+        timestamp = int(timestamp if timestamp is not None else time.time() * 1000)
+        tiles = to_tiles(np.asarray(image))
+
+        keyframe = (self.previous is None or self.previous.shape != tiles.shape
+                    or self.group_frames >= self.keyframe_interval)
+        if keyframe:
+            if self.file is None or self.groups >= self.chunk_groups:
+                self._next_chunk()
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG')
+            blob, count = buffer.getvalue(), len(tiles)
+            self.groups += 1
+            self.group_frames = 0
+            self.key_offset = self.file.tell()
+        else:
+            blob, count = encode_delta(tiles, self.previous)
+
+        offset = self.file.tell()
+        self.file.write(blob)
+        self.file.flush()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO frames (stream, name, timestamp, chunk, offset, length, key_offset, kind, tiles, width, height) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.stream, name, timestamp, self.chunk, offset, len(blob), self.key_offset,
+                 "key" if keyframe else "delta", count, image.width, image.height)
+            )
+        self.previous = tiles
+        self.group_frames += 1
+        return {"kind": "key" if keyframe else "delta", "bytes": len(blob), "tiles": count}
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class ArchiveReader:
+    """Random access to archived frames by timestamp or original file name (thread-safe)"""
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self.conn = connect(directory)
+        self._lock = threading.Lock()
+        self._last = None  # (chunk, key_offset, offset, tiles) of the last decoded frame
+
+    def lookup(self, timestamp, stream="default"):
+        """Index row of the frame on screen at timestamp (the newest one not after it)"""
+        row = self.conn.execute(
+            "SELECT * FROM frames WHERE stream = ? AND timestamp <= ? ORDER BY timestamp DESC, id DESC LIMIT 1",
+            (stream_name(stream), int(timestamp))
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"No archived frame of {stream} at or before {timestamp}")
+        return row
+
+    def read(self, timestamp, stream="default"):
+        """(frame timestamp in ms, RGB image) of the frame on screen at timestamp"""
+        with self._lock:
+            row = self.lookup(timestamp, stream)
+            return row["timestamp"], self._decode(row)
+
+    def read_name(self, name):
+        """Image of the frame archived from the file called name"""
+        with self._lock:
+            return self._decode(self._named(name))
+
+    def png(self, name):
+        """PNG bytes of the frame archived as name; a keyframe's stored PNG is returned as-is"""
+        with self._lock:
+            row = self._named(name)
+            if row["kind"] == "key":
+                with open(os.path.join(self.directory, row["chunk"]), 'rb') as f:
+                    f.seek(row["offset"])
+                    return f.read(row["length"])
+            image = self._decode(row)
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def has(self, name):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM frames WHERE name = ?", (name,)).fetchone() is not None
+
+    def _named(self, name):
+        row = self.conn.execute("SELECT * FROM frames WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"{name} is not archived")
+        return row
+
+    def _decode(self, row):
+        chunk, key_offset, offset = row["chunk"], row["key_offset"], row["offset"]
+        # Reading forward within the group continues from the last decoded frame
+        if self._last and self._last[:2] == (chunk, key_offset) and self._last[2] <= offset:
+            start, tiles = self._last[2], self._last[3].copy()
+        else:
+            start, tiles = key_offset, None
+
+        records = self.conn.execute(
+            "SELECT offset, length, kind, tiles FROM frames WHERE chunk = ? AND offset >= ? AND offset <= ? ORDER BY offset",
+            (chunk, start, offset)
+        ).fetchall()
+        with open(os.path.join(self.directory, chunk), 'rb') as f:
+            f.seek(records[0]["offset"])
+            data = f.read(offset + row["length"] - records[0]["offset"])
+
+        base = records[0]["offset"]
+        for record in records:
+            if tiles is not None and record["offset"] == start:
+                continue  # Already applied
+            blob = data[record["offset"] - base:record["offset"] - base + record["length"]]
+            if record["kind"] == "key":
+                tiles = to_tiles(np.asarray(Image.open(io.BytesIO(blob)).convert("RGB")))
+            else:
+                apply_delta(tiles, blob, record["tiles"])
+
+        self._last = (chunk, key_offset, offset, tiles)
+        return from_tiles(tiles, row["width"], row["height"])
+
+    def close(self):
+        self.conn.close()
+
+_readers = {}  # (pid, directory) -> ArchiveReader; a forked process opens its own
+_readers_lock = threading.Lock()
+
+def shared_reader(directory=ARCHIVE_DIR):
+    """This process's reader of an archive directory, None if there is no archive yet"""
+    key = (os.getpid(), directory)
+    with _readers_lock:
+        if key not in _readers:
+            if not os.path.isdir(directory):
+                return None
+            _readers[key] = ArchiveReader(directory)
+        return _readers[key]
+
+def archived_png(name, directory=ARCHIVE_DIR):
+    """PNG bytes of an archived frame by its original file name (KeyError if unknown)"""
+    reader = shared_reader(directory)
+    if reader is None:
+        raise KeyError(f"{name} is not archived")
+    return reader.png(name)
+
+def is_archived(name, directory=ARCHIVE_DIR):
+    reader = shared_reader(directory)
+    return reader is not None and reader.has(name)
+
+def archive_size(directory=ARCHIVE_DIR):
+    """Bytes used by the chunk files and the index"""
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+               if name.endswith(".chunk") or name.startswith("index.sqlite"))
+
+def list_pngs(path):
+    """PNG screenshots of a directory as {stream: [(timestamp ms, name)]} in capture order
+
+    The capture time in the file name wins over the modification time, which
+    copies and downloads of a recording do not keep.
+    """
+    streams = {}
+    for name in os.listdir(path):
+        if not name.lower().endswith('.png'):
+            continue
+        mtime = os.path.getmtime(os.path.join(path, name))
+        match = FILENAME_TIMESTAMP.search(name)
+        if match:
+            seconds = int(match.group(1))
+            timestamp = int(mtime * 1000) if int(mtime) == seconds else seconds * 1000
+            stream, key = name[:match.start()], (seconds, int(match.group(2) or 0), timestamp)
+        else:
+            stream, key = "screenshots", (int(mtime), 0, int(mtime * 1000))
+        streams.setdefault(stream, []).append((key, name))
+    return {stream: [(key[2], name) for key, name in sorted(frames)] for stream, frames in streams.items()}
+
+def migrate(path, directory=ARCHIVE_DIR, delete=False):
+    """Archive every PNG in path not archived yet; with delete, remove each one once it reads back identical"""
+    summary = {"frames": 0, "skipped": 0, "png_bytes": 0, "deleted": 0}
+    with closing(connect(directory)) as conn:
+        archived = {row[0] for row in conn.execute("SELECT name FROM frames WHERE name IS NOT NULL")}
+
+    for stream, frames in list_pngs(path).items():
+        todo = [(timestamp, name) for timestamp, name in frames if name not in archived]
+        summary["skipped"] += len(frames) - len(todo)
+        if todo:
+            with ArchiveWriter(directory, stream) as writer:
+                for timestamp, name in todo:
+                    filepath = os.path.join(path, name)
+                    with Image.open(filepath) as image:
+                        writer.add(image, timestamp=timestamp, name=name)
+                    summary["frames"] += 1
+                    summary["png_bytes"] += os.path.getsize(filepath)
+            print(f"📦 {stream}: archived {len(todo)} frames")
+
+        if delete:
+            reader = ArchiveReader(directory)
+            try:
+                for _, name in frames:
+                    filepath = os.path.join(path, name)
+                    with Image.open(filepath) as image:
+                        original = np.asarray(image.convert("RGB"))
+                    if np.array_equal(np.asarray(reader.read_name(name)), original):
+                        os.remove(filepath)
+                        summary["deleted"] += 1
+                    else:
+                        print(f"⚠️ {name} did not read back identical, kept")
+            finally:
+                reader.close()
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyframe + tile delta screenshot archive")
+    parser.add_argument("--archive", default=ARCHIVE_DIR, help="Archive directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser("migrate", help="Archive existing PNG screenshots")
+    migrate_parser.add_argument("path", nargs="?", default="screenshots")
+    migrate_parser.add_argument("--delete", action="store_true", help="Remove PNGs that read back identical")
+    extract_parser = commands.add_parser("extract", help="Write the frame on screen at a timestamp as PNG")
+    extract_parser.add_argument("stream")
+    extract_parser.add_argument("timestamp", type=int, help="Milliseconds since the epoch")
+    extract_parser.add_argument("output")
+    commands.add_parser("stats", help="Frames and size per stream")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        summary = migrate(args.path, args.archive, args.delete)
+        size = archive_size(args.archive)
+        print(f"✅ {summary['frames']} frames archived ({summary['skipped']} already were), "
+              f"{summary['png_bytes'] / 1024 / 1024:.1f}MB of PNGs, archive now {size / 1024 / 1024:.1f}MB, "
+              f"{summary['deleted']} PNGs deleted")
+    elif args.command == "extract":
+        reader = ArchiveReader(args.archive)
+        timestamp, image = reader.read(args.timestamp, args.stream)
+        image.save(args.output)
+        print(f"🖼️ Frame of {timestamp} written to {args.output}")
+    else:
+        with closing(connect(args.archive)) as conn:
+            for row in conn.execute("SELECT stream, COUNT(*) AS frames, SUM(kind = 'key') AS keys, SUM(length) AS bytes, "
+                                    "MIN(timestamp) AS first, MAX(timestamp) AS last FROM frames GROUP BY stream"):
+                print(f"{row['stream']}: {row['frames']} frames ({row['keys']} keyframes), "
+                      f"{row['bytes'] / 1024 / 1024:.1f}MB, {row['first']} - {row['last']}")
+
+if __name__ == "__main__":
+    main()
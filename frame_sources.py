@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Frame sources for the capture worker
+LiveFrameSource grabs the screen every few seconds; ReplayFrameSource feeds
+previously recorded screenshots (a directory, .zip or .tar archive) through
+the same pipeline with original timing, a speed multiplier, or as fast as
+possible.
+"""
+
+import io
+import os
+import re
+import time
+import tarfile
+import zipfile
+from PIL import Image
+from utils import capture_screenshot
+
+# live_<ts>_<n>.png, live_<session>_<ts>_<n>.png, benchmark_test_<ts>.png
+FILENAME_TIMESTAMP = re.compile(r'_(\d{9,})(?:_(\d+))?\.png$')
+
+class LiveFrameSource:
+    """Capture a monitor at a fixed interval (with an open mss instance if given)"""
+
+    def __init__(self, monitor=1, interval=5.0, capturer=None):
+        self.monitor = monitor
+        self.interval = interval
+        self.capturer = capturer
+        self._next_capture = time.monotonic()
+
+    def wait(self, stop_event):
+        """Block until the next frame is due, False if stopped meanwhile"""
+        delay = self._next_capture - time.monotonic()
+        if delay > 0 and stop_event.wait(delay):
+            return False
+        self._next_capture = max(self._next_capture + self.interval, time.monotonic())
+        return not stop_event.is_set()
+
+    @property
+    def finished(self):
+        return False
+
+    def grab(self):
+        return capture_screenshot(self.monitor, self.capturer)
+
+    def close(self):
+        pass
+
+class ReplayFrameSource:
+    """Replay recorded PNG screenshots in capture order
+
+    speed=1.0 reproduces the original gaps between captures, speed=10 plays
+    ten times faster and speed=0 replays as fast as the pipeline accepts.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False):
+        self.path = path
+        self.speed = speed or 0
+        self.loop = loop
+        self._archive = None
+        self._frames = self._list_frames()  # [(timestamp, name)]
+        self._index = 0
+        self._last_timestamp = None
+        self._next_due = time.monotonic()
+
+    def _list_frames(self):
+        if os.path.isdir(self.path):
+            names = [n for n in os.listdir(self.path) if n.lower().endswith('.png')]
+            mtime = lambda n: os.path.getmtime(os.path.join(self.path, n))
+        elif zipfile.is_zipfile(self.path):
+            self._archive = zipfile.ZipFile(self.path)
+            infos = {i.filename: i for i in self._archive.infolist() if i.filename.lower().endswith('.png')}
+            names = list(infos)
+            mtime = lambda n: time.mktime(infos[n].date_time + (0, 0, -1))
+        elif tarfile.is_tarfile(self.path):
+            self._archive = tarfile.open(self.path)
+            infos = {m.name: m for m in self._archive.getmembers() if m.isfile() and m.name.lower().endswith('.png')}
+            names = list(infos)
+            mtime = lambda n: infos[n].mtime
+        else:
+            raise ValueError(f"Replay source must be a directory, .zip or .tar archive: {self.path}")
+
+        frames = []
+        for name in names:
+            match = FILENAME_TIMESTAMP.search(os.path.basename(name))
+            if match:
+                frames.append(((int(match.group(1)), int(match.group(2) or 0)), name))
+            else:
+                frames.append(((mtime(name), 0), name))
+        frames.sort()
+        return [(key[0], name) for key, name in frames]
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def finished(self):
+        """True once every recorded frame was grabbed and the replay does not loop"""
+        return self._index >= len(self._frames) and not (self.loop and self._frames)
+
+    def wait(self, stop_event):
+        """Block until the next recorded frame is due, False if stopped meanwhile"""
+        if self._index >= len(self._frames):
+            if not self.loop or not self._frames:
+                return True  # The caller checks finished before grabbing
+            self._index = 0
+            self._last_timestamp = None
+
+        timestamp = self._frames[self._index][0]
+        if self.speed > 0 and self._last_timestamp is not None:
+            self._next_due += max(timestamp - self._last_timestamp, 0) / self.speed
+            delay = self._next_due - time.monotonic()
+            if delay > 0 and stop_event.wait(delay):
+                return False
+        else:
+            self._next_due = time.monotonic()
+        self._last_timestamp = timestamp
+        return not stop_event.is_set()
+
+    def grab(self):
+        """Next recorded frame as an RGB image, or None when the recording is exhausted"""
+        if self._index >= len(self._frames):
+            return None
+        name = self._frames[self._index][1]
+        self._index += 1
+
+        if self._archive is None:
+            image = Image.open(os.path.join(self.path, name))
+        elif isinstance(self._archive, zipfile.ZipFile):
+            image = Image.open(io.BytesIO(self._archive.read(name)))
+        else:
+            image = Image.open(io.BytesIO(self._archive.extractfile(name).read()))
+        return image.convert("RGB")
+
+    def close(self):
+        if self._archive is not None:
+            self._archive.close()
+
+def make_frame_source(config, capturer=None):
+    """Build the frame source described by a session config"""
+    if config.get("source", "live") == "replay":
+        return ReplayFrameSource(config["replay_path"], speed=config.get("replay_speed", 1.0),
+                                 loop=config.get("replay_loop", False))
+    return LiveFrameSource(config.get("monitor", 1), config.get("interval", 5.0), capturer)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Activity memory
+Successful analyses of live and remote sessions are stored as rows of the
+`memories` table in openmemory.sqlite. A background summarizer folds only
+the rows newer than the watermark into per-hour abstracts, and each touched
+hour into its day's abstract, in `memory_abstracts`. "What did I do today"
+is then a single indexed read.
+
+Memory timestamps are the capture time of the analyzed frame, in
+milliseconds since the epoch. Analyses finish out of order and resumed
+frames keep the capture time of an earlier run, so the watermark is not a
+timestamp but the id of the newest folded row (ids follow insert order):
+last_processed_id of the hour abstracts, written in the same transaction
+as their content. A late row is folded into the hour it was captured in.
+
+Usage:
+    python memory.py [--hours]   # fold new memories, then print today's abstract
+"""
+
+import os
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timedelta
+from contextlib import closing
+from utils import summarize_with_model
+from workers import DEFAULT_MODEL
+
+MEMORY_DB = os.getenv('MEMORY_DB', 'openmemory.sqlite')
+SUMMARY_MODEL = os.getenv('SUMMARY_MODEL', DEFAULT_MODEL)
+SUMMARY_INTERVAL = float(os.getenv('SUMMARY_INTERVAL', '60'))  # Seconds between background passes
+
+CHUNK_ROWS = 100   # Memories folded per model call
+NOTE_CHARS = 400   # Each memory is clipped to this many characters before folding
+HOUR_WORDS = 150   # Size bound of an hour abstract
+DAY_WORDS = 300    # Size bound of a day abstract
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+def connect(path=MEMORY_DB):
+    """Open the memory database, creating and upgrading the schema on first use"""
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    with _schema_lock:
+        if path not in _schema_ready:
+            ensure_schema(conn)
+            _schema_ready.add(path)
+    return conn
+
+def ensure_schema(conn):
+    """Create the tables if missing and add the hierarchy columns to memory_abstracts"""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS memories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            speaker TEXT NOT NULL,
+            message TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            sequence INTEGER NOT NULL DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(timestamp, sequence)
+        );
+        CREATE INDEX IF NOT EXISTS idx_memories_timestamp ON memories(timestamp);
+        CREATE TABLE IF NOT EXISTS memory_abstracts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            abstract_content TEXT NOT NULL,
+            last_processed_timestamp INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    # level is "hour" or "day", period_start the local start of that period in ms
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(memory_abstracts)")}
+    if "level" not in columns:
+        conn.execute("ALTER TABLE memory_abstracts ADD COLUMN level TEXT")
+    if "period_start" not in columns:
+        conn.execute("ALTER TABLE memory_abstracts ADD COLUMN period_start INTEGER")
+    if "last_processed_id" not in columns:
+        conn.execute("ALTER TABLE memory_abstracts ADD COLUMN last_processed_id INTEGER NOT NULL DEFAULT 0")
+        # Abstracts written under the old timestamp watermark covered the rows up to it
+        conn.execute("UPDATE memory_abstracts SET last_processed_id = (SELECT COALESCE(MAX(id), 0) FROM memories "
+                     "WHERE timestamp <= memory_abstracts.last_processed_timestamp)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_memory_abstracts_period ON memory_abstracts(level, period_start)")
+    conn.commit()
+
+def now_ms():
+    return int(datetime.now().timestamp() * 1000)
+
+def hour_start(timestamp):
+    """Local start of the hour containing a ms timestamp, in ms"""
+    start = datetime.fromtimestamp(timestamp / 1000).replace(minute=0, second=0, microsecond=0)
+    return int(start.timestamp() * 1000)
+
+def day_start(timestamp):
+    """Local midnight before a ms timestamp, in ms"""
+    start = datetime.fromtimestamp(timestamp / 1000).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(start.timestamp() * 1000)
+
+def add_memory(message, speaker="screen", timestamp=None, path=MEMORY_DB):
+    """Store one observation; same-millisecond rows get increasing sequence numbers"""
+    timestamp = int(timestamp if timestamp is not None else now_ms())
+    with closing(connect(path)) as conn, conn:
+        conn.execute(
+            "INSERT INTO memories (speaker, message, timestamp, sequence) "
+            "SELECT ?, ?, ?, COALESCE(MAX(sequence) + 1, 0) FROM memories WHERE timestamp = ?",
+            (speaker, message, timestamp, timestamp)
+        )
+
+def get_watermark(conn):
+    """Id of the newest memory already folded into an abstract"""
+    row = conn.execute("SELECT MAX(last_processed_id) FROM memory_abstracts WHERE level = 'hour'").fetchone()
+    return row[0] or 0
+
+def next_chunk(conn, after, limit=CHUNK_ROWS):
+    """Oldest unfolded memories in insert order
+
+    SQLite assigns ids inside the serialized write transaction, so once a row
+    is visible every row with a smaller id is too: nothing lands behind the
+    watermark.
+    """
+    return conn.execute("SELECT id, speaker, message, timestamp FROM memories WHERE id > ? ORDER BY id LIMIT ?",
+                        (after, limit)).fetchall()
+
+def get_abstract(conn, level, period_start):
+    row = conn.execute(
+        "SELECT abstract_content FROM memory_abstracts WHERE level = ? AND period_start = ?",
+        (level, period_start)
+    ).fetchone()
+    return row[0] if row else ""
+
+def save_abstract(conn, level, period_start, content, last_processed, last_id):
+    conn.execute(
+        "INSERT INTO memory_abstracts (abstract_content, last_processed_timestamp, last_processed_id, level, period_start) "
+        "VALUES (?, ?, ?, ?, ?) ON CONFLICT(level, period_start) DO UPDATE SET "
+        "abstract_content = excluded.abstract_content, "
+        "last_processed_timestamp = MAX(last_processed_timestamp, excluded.last_processed_timestamp), "
+        "last_processed_id = MAX(last_processed_id, excluded.last_processed_id), "
+        "updated_at = CURRENT_TIMESTAMP",
+        (content, last_processed, last_id, level, period_start)
+    )
+
+def fold_chunk(conn, rows, watermark, model=SUMMARY_MODEL):
+    """Fold one chunk into its hour abstracts and their day abstracts, then commit
+
+    The model calls run before the write transaction; the transaction checks
+    that nobody moved the watermark meanwhile, so a concurrent summarizer
+    can never fold the same rows twice. Returns False if it lost that race.
+    """
+    by_hour = {}
+    for row in sorted(rows, key=lambda row: (row["timestamp"], row["id"])):
+        by_hour.setdefault(hour_start(row["timestamp"]), []).append(row)
+    last_id = rows[-1]["id"]
+
+    hours = {}  # hour start -> (abstract, newest timestamp)
+    for hour, hour_rows in by_hour.items():
+        notes = [f"{datetime.fromtimestamp(row['timestamp'] / 1000):%H:%M} [{row['speaker']}] "
+                 f"{' '.join(row['message'].split())[:NOTE_CHARS]}" for row in hour_rows]
+        abstract = summarize_with_model(get_abstract(conn, "hour", hour), notes, model, HOUR_WORDS)
+        hours[hour] = (abstract, hour_rows[-1]["timestamp"])
+
+    # A day abstract is rebuilt from its (bounded) hour abstracts, not from raw rows
+    days = {}
+    for day in sorted({day_start(hour) for hour in hours}):
+        next_day = day_start(day + int(timedelta(hours=36).total_seconds() * 1000))
+        day_hours = {row["period_start"]: row["abstract_content"] for row in conn.execute(
+            "SELECT period_start, abstract_content FROM memory_abstracts "
+            "WHERE level = 'hour' AND period_start >= ? AND period_start < ?", (day, next_day))}
+        day_hours.update({hour: abstract for hour, (abstract, _) in hours.items() if day <= hour < next_day})
+        notes = [f"{datetime.fromtimestamp(hour / 1000):%H}:00 {' '.join(abstract.split())}"
+                 for hour, abstract in sorted(day_hours.items())]
+        newest = max(last for hour, (_, last) in hours.items() if day <= hour < next_day)
+        days[day] = (summarize_with_model("", notes, model, DAY_WORDS), newest)
+
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if get_watermark(conn) != watermark:
+            conn.rollback()
+            return False
+        for hour, (abstract, last) in hours.items():
+            save_abstract(conn, "hour", hour, abstract, last, last_id)
+        for day, (abstract, last) in days.items():
+            save_abstract(conn, "day", day, abstract, last, last_id)
+    return True
+
+def summarize_pending(path=MEMORY_DB, model=SUMMARY_MODEL):
+    """Fold every memory newer than the watermark, returns the rows folded"""
+    folded = 0
+    with closing(connect(path)) as conn:
+        while True:
+            watermark = get_watermark(conn)
+            rows = next_chunk(conn, watermark)
+            if not rows or not fold_chunk(conn, rows, watermark, model):
+                return folded
+            folded += len(rows)
+
+def summarizer_loop(stop_event, interval=SUMMARY_INTERVAL, path=MEMORY_DB, model=SUMMARY_MODEL):
+    """Background thread body: fold new memories every interval seconds"""
+    while not stop_event.wait(interval):
+        try:
+            folded = summarize_pending(path, model)
+            if folded:
+                print(f"🧠 Folded {folded} memories into the activity abstracts")
+        except Exception as e:
+            print(f"Summarizer error: {e}")
+
+def today(include_hours=False, path=MEMORY_DB):
+    """Today's day abstract (and optionally its hour abstracts) - one indexed read"""
+    start = day_start(now_ms())
+    levels = ("day", "hour") if include_hours else ("day",)
+    with closing(connect(path)) as conn:
+        rows = conn.execute(
+            "SELECT level, period_start, abstract_content, last_processed_timestamp, updated_at "
+            f"FROM memory_abstracts WHERE level IN ({','.join('?' * len(levels))}) AND period_start >= ? "
+            "ORDER BY period_start", levels + (start,)
+        ).fetchall()
+
+    day = next((row for row in rows if row["level"] == "day" and row["period_start"] == start), None)
+    summary = {
+        "date": datetime.fromtimestamp(start / 1000).strftime("%Y-%m-%d"),
+        "abstract": day["abstract_content"] if day else "",
+        "last_processed_timestamp": day["last_processed_timestamp"] if day else None,
+        "updated_at": day["updated_at"] if day else None
+    }
+    if include_hours:
+        summary["hours"] = [{
+            "hour": datetime.fromtimestamp(row["period_start"] / 1000).strftime("%H:00"),
+            "abstract": row["abstract_content"],
+            "last_processed_timestamp": row["last_processed_timestamp"]
+        } for row in rows if row["level"] == "hour"]
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold new memories into the activity abstracts and print today's")
+    parser.add_argument("--db", default=MEMORY_DB, help="SQLite memory database")
+    parser.add_argument("--model", default=SUMMARY_MODEL, help='Summary model id, or "mock" for local extractive summaries')
+    parser.add_argument("--hours", action="store_true", help="Also print the hourly abstracts")
+    args = parser.parse_args()
+
+    folded = summarize_pending(args.db, args.model)
+    print(f"🧠 Folded {folded} new memories")
+
+    summary = today(args.hours, args.db)
+    print(f"\n# What I did today ({summary['date']})\n")
+    print(summary["abstract"] or "(nothing recorded yet)")
+    for hour in summary.get("hours", []):
+        print(f"\n## {hour['hour']}\n{hour['abstract']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style metrics
+Counters, gauges and histograms rendered in the text exposition format.
+Worker processes do not touch these directly: the frame's trace spans ride
+along on the messages they already put on the result queue, and the web
+server observes them when the message arrives.
+"""
+
+import bisect
+import threading
+
+# Latency buckets (seconds) - fine at the low end for local stages, wide enough for slow models
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._render_samples())
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _render_samples(self):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _render_samples(self):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._values[key] = state
+            state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_samples(self):
+        lines = []
+        for key, state in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+class Registry:
+    """Collection of metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Metrics exported by the web dashboard
+registry = Registry()
+
+stage_latency = registry.histogram(
+    "pipeline_stage_seconds",
+    "Per-frame latency of each pipeline stage and queue wait (capture, resize, save, archive, load, encode, upload, model, *_wait, emit)",
+    labels=("stage",)
+)
+time_to_emit = registry.histogram(
+    "frame_time_to_emit_seconds", "Time from the start of a capture until its analysis is emitted to clients"
+)
+frames_captured = registry.counter(
+    "frames_captured_total", "Screenshots captured", labels=("session",)
+)
+frames_dropped = registry.counter(
+    "frames_dropped_total", "Frames dropped by the scheduler to honour a session quota", labels=("session",)
+)
+analyses = registry.counter(
+    "analyses_total", "Analyses finished, by model and outcome", labels=("model", "status")
+)
+errors = registry.counter(
+    "errors_total", "Errors by pipeline stage and error class", labels=("stage", "error_class")
+)
+agent_bytes = registry.counter(
+    "agent_frame_bytes_total", "Encoded frame bytes received from remote capture agents", labels=("agent",)
+)
+queue_depth = registry.gauge(
+    "queue_depth", "Frames waiting in a queue", labels=("queue",)
+)
+session_pending = registry.gauge(
+    "session_pending_frames", "Frames waiting in a session's scheduler queue", labels=("session",)
+)
+in_flight = registry.gauge(
+    "analyses_in_flight", "Analyses dispatched to the worker pool and not yet finished"
+)
+
+worker_control = registry.histogram(
+    "worker_control_seconds",
+    "Capture worker start/stop latency, from the command until the worker confirms; "
+    "mode is warm (pre-forked) or cold (spawned or torn down)",
+    labels=("action", "mode")
+)
+
+def observe_spans(spans, exclude_proc=None):
+    """Record trace spans (see tracing.py) as stage latencies"""
+    for span in spans or ():
+        if span["proc"] != exclude_proc:
+            stage_latency.observe(span["end"] - span["start"], stage=span["name"])
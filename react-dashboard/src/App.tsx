@@ -4,6 +4,7 @@ import Header from './components/Header';
 import ScreenshotGallery from './components/ScreenshotGallery';
 import AnalysisStream from './components/AnalysisStream';
 import MetricsBar from './components/MetricsBar';
+import SearchPanel from './components/SearchPanel';
 import { AppState, Screenshot, StreamItem, Stats, AnalysisResult } from './types';
 
 const SOCKET_URL = 'http://localhost:8080';
@@ -12,6 +13,7 @@ const initialStats: Stats = {
   screenshots_taken: 0,
   analyses_completed: 0,
   analyses_failed: 0,
+  analyses_cancelled: 0,
   avg_analysis_time: 0,
   success_rate: 0,
   runtime: 0,
@@ -230,6 +232,11 @@ const App: React.FC = () => {
           <div className="flex-1 bg-macos-bg/80 backdrop-blur-macos overflow-hidden">
             <AnalysisStream streamItems={appState.streamItems} />
           </div>
+
+          {/* Right Panel - Semantic Search */}
+          <div className="w-96 bg-macos-surface/50 backdrop-blur-macos border-l border-macos-border/30 overflow-hidden">
+            <SearchPanel serverUrl={SOCKET_URL} />
+          </div>
         </div>
 
         {/* Bottom Status Bar */}
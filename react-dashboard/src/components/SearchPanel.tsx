@@ -0,0 +1,89 @@
+import React, { useState } from 'react';
+import { SearchResponse, SearchResult } from '../types';
+
+interface SearchPanelProps {
+  serverUrl: string;
+}
+
+const SearchPanel: React.FC<SearchPanelProps> = ({ serverUrl }) => {
+  const [query, setQuery] = useState<string>('');
+  const [results, setResults] = useState<SearchResult[]>([]);
+  const [summary, setSummary] = useState<string>('');
+  const [error, setError] = useState<string>('');
+
+  // Text search (q) or "more like this memory" (like)
+  const runSearch = async (params: Record<string, string>) => {
+    setError('');
+    try {
+      const response = await fetch(`${serverUrl}/api/search?${new URLSearchParams({ ...params, k: '10' })}`);
+      const data = await response.json();
+      if (!response.ok) {
+        setError(data.error || `Search failed (${response.status})`);
+        return;
+      }
+      const searchData = data as SearchResponse;
+      setResults(searchData.results);
+      setSummary(`${searchData.results.length} of ${searchData.indexed} memories in ${searchData.took_ms.toFixed(1)}ms`);
+    } catch {
+      setError('Search server unreachable');
+    }
+  };
+
+  const handleSubmit = (event: React.FormEvent) => {
+    event.preventDefault();
+    if (query.trim()) {
+      runSearch({ q: query.trim() });
+    }
+  };
+
+  return (
+    <div className="h-full flex flex-col">
+      {/* Header */}
+      <div className="p-6 border-b border-macos-border/30">
+        <h2 className="text-macos-text text-lg font-semibold">Search History</h2>
+        <p className="text-macos-text-secondary text-sm">Find screens by description</p>
+        <form onSubmit={handleSubmit} className="mt-4 flex space-x-2">
+          <input
+            value={query}
+            onChange={event => setQuery(event.target.value)}
+            placeholder="terminal running tests..."
+            className="flex-1 bg-macos-card/50 border border-macos-border/30 rounded-lg px-3 py-2 text-sm text-macos-text focus-ring"
+          />
+          <button
+            type="submit"
+            className="macos-button px-4 py-2 rounded-lg font-medium text-sm shadow-macos-button focus-ring bg-macos-blue text-white"
+          >
+            Search
+          </button>
+        </form>
+        {error && <p className="mt-2 text-macos-red text-xs">{error}</p>}
+        {!error && summary && <p className="mt-2 text-macos-text-secondary text-xs font-sf-mono">{summary}</p>}
+      </div>
+
+      {/* Results */}
+      <div className="flex-1 overflow-y-auto p-6 space-y-3">
+        {results.map(result => (
+          <div key={result.id} className="bg-macos-card/30 border border-macos-border/30 rounded-macos-lg p-4">
+            <div className="flex items-center justify-between mb-2">
+              <span className="text-macos-text-secondary text-xs font-sf-mono">
+                {new Date(result.timestamp).toLocaleString()} · {result.speaker}
+              </span>
+              <span className="text-macos-text-secondary text-xs font-sf-mono">{result.score.toFixed(3)}</span>
+            </div>
+            <div className="text-macos-text text-sm leading-relaxed whitespace-pre-wrap break-words line-clamp-4">
+              {result.message}
+            </div>
+            <button
+              onClick={() => runSearch({ like: String(result.id) })}
+              className="mt-2 text-macos-blue text-xs hover:underline"
+            >
+              Similar screens
+            </button>
+          </div>
+        ))}
+      </div>
+    </div>
+  );
+};
+
+export default SearchPanel;
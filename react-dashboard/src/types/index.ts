@@ -2,6 +2,7 @@
 
 export interface Screenshot {
   num: number;
+  session_id?: string;
   filename: string;
   filepath: string;
   size_kb: number;
@@ -9,11 +10,13 @@ export interface Screenshot {
 }
 
 export interface AnalysisResult {
+  session_id?: string;
   screenshot_num: number;
   analyze_time: number;
   success: boolean;
   response?: string;
   error?: string;
+  trace_id?: string;
   timestamp: string;
 }
 
@@ -24,13 +27,61 @@ export interface StreamItem {
   type: 'status' | 'analysis' | 'error';
 }
 
+export interface SessionQueue {
+  pending: number;
+  in_flight: number;
+  dispatched: number;
+  dropped: number;
+  weight: number;
+}
+
+export interface SessionConfig {
+  source: 'live' | 'replay' | 'remote';
+  monitor: number;
+  interval: number;
+  replay_path: string | null;
+  replay_speed: number;
+  replay_loop: boolean;
+  weight: number;
+  max_pending: number;
+  max_in_flight: number | null;
+  storage: 'png' | 'archive';
+}
+
+export interface SessionTransfer {
+  frames_per_sec: number;
+  kb_received: number;
+  kb_per_sec: number;
+  baseline_frames: number;
+  base64_json_kb_per_frame: number;
+  binary_saving: number;
+  codec_saving: number;
+  total_saving: number;
+}
+
+export interface SessionStats {
+  screenshots_taken: number;
+  analyses_completed: number;
+  analyses_failed: number;
+  analyses_cancelled: number;
+  avg_analysis_time: number;
+  success_rate: number;
+  runtime: number;
+  running: boolean;
+  config: SessionConfig;
+  queue: SessionQueue;
+  transfer?: SessionTransfer;  // Remote (capture agent) sessions only
+}
+
 export interface Stats {
   screenshots_taken: number;
   analyses_completed: number;
   analyses_failed: number;
+  analyses_cancelled: number;
   avg_analysis_time: number;
   success_rate: number;
   runtime: number;
+  sessions?: Record<string, SessionStats>;
 }
 
 export interface AppState {
@@ -48,4 +99,17 @@ export type SocketEventData = {
   analysis_result: AnalysisResult;
   stats_update: Stats;
   error_message: { message: string; timestamp: string };
-};
\ No newline at end of file
+};
+export interface SearchResult {
+  id: number;
+  speaker: string;
+  timestamp: number;
+  message: string;
+  score: number;
+}
+
+export interface SearchResponse {
+  results: SearchResult[];
+  took_ms: number;
+  indexed: number;
+}
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Replay Throughput Benchmark
+Drives recorded screenshots through the same capture and analysis workers as
+the web dashboard, without the web server, and reports the frames/sec
+ceiling plus a per-stage breakdown. Uses the local mock model by default so
+it runs on headless CI boxes.
+
+Usage:
+    python replay.py screenshots/ [--speed 0] [--workers 2] [--model mock]
+"""
+
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from queue import Empty
+from workers import screenshot_worker, analysis_worker
+from scheduler import AnalysisScheduler
+from tracing import TraceWriter, mark_enqueued, mark_dequeued
+from trace_report import generate_report
+
+SESSION_ID = "replay"
+
+def run_replay(path, speed=0, workers=2, model="mock", max_pending=5, trace_file=None, screenshot_dir=None):
+    """Replay a recording through the pipeline and return (stats, traces)"""
+    output_dir = screenshot_dir or tempfile.mkdtemp(prefix="replay_")
+    config = {
+        "source": "replay",
+        "replay_path": path,
+        "replay_speed": speed,
+        "screenshot_dir": output_dir
+    }
+
+    frame_queue = multiprocessing.Queue()
+    analysis_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    stop_event = multiprocessing.Event()
+
+    scheduler = AnalysisScheduler(capacity=workers)
+    scheduler.add_session(SESSION_ID, max_pending=max_pending)
+    writer = TraceWriter(trace_file) if trace_file else None
+
+    analysis_processes = [
+        multiprocessing.Process(target=analysis_worker, args=(analysis_queue, result_queue, stop_event, model))
+        for _ in range(workers)
+    ]
+    for process in analysis_processes:
+        process.start()
+
+    start_time = time.monotonic()
+    capture_process = multiprocessing.Process(
+        target=screenshot_worker,
+        args=(SESSION_ID, config, frame_queue, result_queue, stop_event)
+    )
+    capture_process.start()
+
+    stats = {"captured": 0, "analyzed": 0, "failed": 0, "dropped": 0, "errors": []}
+    traces = []
+    capture_done = False
+    capture_end = None
+
+    def finish(trace, status):
+        traces.append(dict(trace, status=status))
+        if writer:
+            writer.write(trace, status)
+
+    try:
+        while True:
+            # Frames from the capture worker go through the scheduler exactly as in web_app
+            while True:
+                try:
+                    frame = frame_queue.get_nowait()
+                except Empty:
+                    break
+                mark_dequeued(frame["trace"], "server")
+                mark_enqueued(frame["trace"], "scheduler")
+                dropped = scheduler.submit(SESSION_ID, frame)
+                if dropped is not None:
+                    mark_dequeued(dropped["trace"], "server")
+                    stats["dropped"] += 1
+                    finish(dropped["trace"], "dropped")
+
+            while True:
+                item = scheduler.next_item()
+                if item is None:
+                    break
+                mark_dequeued(item["trace"], "server")
+                mark_enqueued(item["trace"], "analysis_queue")
+                analysis_queue.put(item)
+
+            try:
+                data = result_queue.get(timeout=0.05)
+            except Empty:
+                data = None
+
+            if data is None:
+                pass
+            elif data["type"] == "screenshot":
+                stats["captured"] += 1
+            elif data["type"] == "analysis":
+                scheduler.complete(data.get("slot"))
+                mark_dequeued(data["trace"], "server")
+                success = data["result"]["success"]
+                stats["analyzed" if success else "failed"] += 1
+                finish(data["trace"], "success" if success else "failure")
+            elif data["type"] == "status" and data.get("finished"):
+                capture_done = True
+                capture_end = time.monotonic()
+            elif data["type"] == "error":
+                stats["errors"].append(data["message"])
+                if data.get("stage") == "capture":
+                    capture_done = True
+                    capture_end = time.monotonic()
+
+            # Every captured frame is accounted for once it was analyzed or dropped
+            accounted = stats["analyzed"] + stats["failed"] + stats["dropped"]
+            if capture_done and accounted >= stats["captured"]:
+                break
+    finally:
+        elapsed = time.monotonic() - start_time
+        stop_event.set()
+        for _ in analysis_processes:
+            analysis_queue.put(None)  # Poison pill
+        for process in analysis_processes + [capture_process]:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        if screenshot_dir is None:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    stats["elapsed"] = elapsed
+    stats["capture_elapsed"] = (capture_end or time.monotonic()) - start_time
+    return stats, traces
+
+def generate_markdown(path, args, stats, traces):
+    """Throughput summary followed by the trace stage breakdown"""
+    elapsed = stats["elapsed"]
+    processed = stats["analyzed"] + stats["failed"]
+
+    markdown = "# Replay Throughput Results\n\n"
+    markdown += f"Test conducted at: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    markdown += f"- Source: `{path}` (speed: {args.speed or 'max'}, model: `{args.model}`, workers: {args.workers})\n"
+    markdown += f"- Frames captured: {stats['captured']} in {stats['capture_elapsed']:.2f}s "
+    markdown += f"({stats['captured'] / max(stats['capture_elapsed'], 1e-9):.2f} frames/s through capture)\n"
+    markdown += f"- Frames analyzed: {processed} in {elapsed:.2f}s ({processed / max(elapsed, 1e-9):.2f} frames/s end-to-end)\n"
+    markdown += f"- Failed: {stats['failed']}, dropped by scheduler quota: {stats['dropped']}\n"
+    if stats["errors"]:
+        markdown += f"- Worker errors: {len(stats['errors'])} (first: {stats['errors'][0]})\n"
+
+    # Per-stage ceiling: how many frames/s one process could push through that stage alone
+    durations = {}
+    for trace in traces:
+        for span in trace["spans"]:
+            if not span["name"].endswith("_wait"):
+                durations.setdefault(span["name"], []).append(span["end"] - span["start"])
+    if durations:
+        markdown += "\n## Stage Ceilings\n\n"
+        markdown += "| Stage | Mean (ms) | Frames/s per process |\n"
+        markdown += "|-------|-----------|----------------------|\n"
+        for stage, values in durations.items():
+            mean = sum(values) / len(values)
+            markdown += f"| {stage} | {mean * 1000:.1f} | {1 / mean if mean > 0 else float('inf'):.1f} |\n"
+
+    markdown += "\n" + generate_report(traces).replace("# Frame Trace Report", "## Trace Breakdown").replace("\n## ", "\n### ")
+    return markdown
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded screenshots through the analysis pipeline")
+    parser.add_argument("path", nargs="?", default="screenshots", help="Directory, .zip or .tar of recorded PNGs")
+    parser.add_argument("--speed", type=float, default=0, help="Speed multiplier over the original timing (0 = as fast as possible)")
+    parser.add_argument("--workers", type=int, default=2, help="Analysis worker processes")
+    parser.add_argument("--model", default="mock", help='Model id, or "mock" / "mock:<seconds>" for the local mock model')
+    parser.add_argument("--max-pending", type=int, default=5, help="Scheduler quota before frames are dropped")
+    parser.add_argument("--traces", help="Also write traces to this JSONL file")
+    args = parser.parse_args()
+
+    print(f"🔁 Replaying {args.path} (speed: {args.speed or 'max'}, model: {args.model})...")
+    stats, traces = run_replay(args.path, args.speed, args.workers, args.model, args.max_pending, args.traces)
+
+    markdown = generate_markdown(args.path, args, stats, traces)
+    results_filename = f"replay_results_{int(time.time())}.md"
+    with open(results_filename, 'w') as f:
+        f.write(markdown)
+
+    print(f"\nResults saved to: {results_filename}")
+    print("\n" + markdown)
+
+if __name__ == "__main__":
+    main()
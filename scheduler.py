@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Shared analysis scheduler
+Weighted fair-share dispatch of captured frames from many monitoring sessions
+onto one pool of analysis workers
+"""
+
+import threading
+from collections import deque
+
+class AnalysisScheduler:
+    """Weighted fair queueing across sessions with per-session quotas
+
+    Each session owns a bounded pending queue. Dispatch picks the backlogged
+    session with the smallest virtual time; every dispatched frame advances
+    that session's virtual time by 1/weight, so a session with weight 2 gets
+    twice the analyses of a session with weight 1 when both are busy.
+
+    Every dispatched frame is stamped with a "slot" id that the analysis
+    result carries back to complete(), so a slot is released exactly once and
+    always against the session run that took it.
+    """
+
+    def __init__(self, capacity=1):
+        self.capacity = capacity  # Max analyses in flight across the whole pool
+        self.in_flight = 0
+        self._sessions = {}
+        self._vclock = 0.0  # Virtual time of the most recent dispatch
+        self._slots = {}  # slot id -> state of the session that dispatched it
+        self._next_slot = 0
+        self._lock = threading.Lock()
+
+    def add_session(self, session_id, weight=1.0, max_pending=5, max_in_flight=None):
+        """Register a session (or update its quotas if it already exists)"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                state = {
+                    "session_id": session_id,
+                    "pending": deque(),
+                    "in_flight": 0,
+                    "vtime": self._vclock,
+                    "dispatched": 0,
+                    "dropped": 0
+                }
+                self._sessions[session_id] = state
+            state["weight"] = max(float(weight), 0.01)
+            state["max_pending"] = max(int(max_pending), 1)
+            state["max_in_flight"] = None if max_in_flight is None else max(int(max_in_flight), 1)
+
+    def remove_session(self, session_id):
+        """Unregister a session and return its frames that were never dispatched"""
+        with self._lock:
+            state = self._sessions.pop(session_id, None)
+            if state is None:
+                return []
+            # Frames still being analyzed keep their slot until complete() is called;
+            # the removed state lives on in self._slots until then
+            return list(state["pending"])
+
+    def submit(self, session_id, item):
+        """Queue a frame for a session, returns the frame dropped to honour the quota (or None)"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                return item
+
+            # A session that was idle must not bank credit while it had nothing to send
+            if not state["pending"] and state["in_flight"] == 0:
+                state["vtime"] = max(state["vtime"], self._vclock)
+
+            state["pending"].append(item)
+            if len(state["pending"]) > state["max_pending"]:
+                # Drop the oldest frame - the newest screen is the interesting one
+                state["dropped"] += 1
+                return state["pending"].popleft()
+            return None
+
+    def next_item(self):
+        """Pick the next frame to analyze, or None if nothing is eligible"""
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                return None
+
+            chosen = None
+            for state in self._sessions.values():
+                if not state["pending"]:
+                    continue
+                if state["max_in_flight"] is not None and state["in_flight"] >= state["max_in_flight"]:
+                    continue
+                if chosen is None or state["vtime"] < chosen["vtime"]:
+                    chosen = state
+
+            if chosen is None:
+                return None
+
+            self._vclock = chosen["vtime"]
+            chosen["vtime"] += 1.0 / chosen["weight"]
+            chosen["in_flight"] += 1
+            chosen["dispatched"] += 1
+            self.in_flight += 1
+            item = chosen["pending"].popleft()
+            item["slot"] = self._next_slot
+            self._slots[self._next_slot] = chosen
+            self._next_slot += 1
+            return item
+
+    def complete(self, slot):
+        """Release the slot held by a finished analysis (unknown slots are ignored)"""
+        with self._lock:
+            state = self._slots.pop(slot, None)
+            if state is None:
+                return
+            state["in_flight"] -= 1
+            self.in_flight -= 1
+
+    def in_flight_slots(self, session_id=None):
+        """Slots of analyses still running, for one session or all of them"""
+        with self._lock:
+            return [slot for slot, state in self._slots.items()
+                    if session_id is None or state["session_id"] == session_id]
+
+    def is_in_flight(self, slot):
+        with self._lock:
+            return slot in self._slots
+
+    def release_all(self):
+        """Forget every in-flight analysis, for when the worker pool was torn down"""
+        with self._lock:
+            for state in self._slots.values():
+                state["in_flight"] = 0
+            self._slots.clear()
+            self.in_flight = 0
+
+    def snapshot(self):
+        """Per-session queue state for stats reporting"""
+        with self._lock:
+            return {
+                session_id: {
+                    "pending": len(state["pending"]),
+                    "in_flight": state["in_flight"],
+                    "dispatched": state["dispatched"],
+                    "dropped": state["dropped"],
+                    "weight": state["weight"]
+                }
+                for session_id, state in self._sessions.items()
+            }
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Semantic search over stored analyses
+Every memory (see memory.py) is embedded on the CPU with a hashing
+vectorizer: word unigrams and bigrams, sublinear term frequency, signed
+feature hashing into SEARCH_DIM dimensions, L2 normalized. No model
+download, no network, and the same text always gets the same vector.
+
+Vectors live in a memory-mapped float32 matrix (SEARCH_DIR/vectors.f32)
+with the memory id of each row in ids.i64. Both files grow by doubling
+and rows are only ever appended; meta.json records how many rows are valid
+and is replaced after the rows are flushed, so a crash loses at most the
+rows of the last append, which the next sync embeds again.
+
+A query is one batched pass over the matrix: cosine similarity of a block
+of rows against all query vectors at once, keeping each block's top k
+with argpartition.
+
+Usage:
+    python search_index.py "terminal running pytest" [-k 10]
+"""
+
+import os
+import re
+import json
+import zlib
+import math
+import argparse
+import threading
+from datetime import datetime
+from collections import Counter
+from contextlib import closing
+import numpy as np
+import memory
+
+SEARCH_DIR = os.getenv('SEARCH_DIR', 'search_index')
+SEARCH_DIM = int(os.getenv('SEARCH_DIM', '256'))  # Only used when the index is created
+SEARCH_SYNC_INTERVAL = float(os.getenv('SEARCH_SYNC_INTERVAL', '5'))  # Seconds between background syncs
+
+INITIAL_ROWS = 1024    # Capacity of a new index, doubled whenever it is full
+BLOCK_ROWS = 65536     # Rows scored per matrix product
+SYNC_BATCH = 1000      # Memories embedded per sync round trip
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_.+#-]*[a-z0-9+#]|[a-z0-9]")
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+def embed(text, dim=SEARCH_DIM):
+    """Hashing-trick vector of a text (float32, unit length unless the text has no tokens)"""
+    tokens = tokenize(text)
+    features = Counter(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature, count in features.items():
+        # crc32 is stable across processes, unlike hash()
+        h = zlib.crc32(feature.encode())
+        sign = 1.0 if h & 0x80000000 else -1.0
+        vector[h % dim] += sign * (1.0 + math.log(count))
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+def embed_batch(texts, dim=SEARCH_DIM):
+    """Embed several texts into one (len(texts), dim) matrix"""
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        matrix[i] = embed(text, dim)
+    return matrix
+
+def top_k(matrix, queries, k, block_rows=BLOCK_ROWS):
+    """Best k rows of matrix for every query row, as [(row indices, scores)] sorted by score
+
+    Rows are scored a block at a time (one matrix product per block), so a
+    memory-mapped matrix is streamed through once for all queries.
+    """
+    rows = matrix.shape[0]
+    k = min(k, rows)
+    best_rows = [np.empty(0, dtype=np.int64) for _ in range(len(queries))]
+    best_scores = [np.empty(0, dtype=np.float32) for _ in range(len(queries))]
+    if k <= 0:
+        return list(zip(best_rows, best_scores))
+
+    for start in range(0, rows, block_rows):
+        scores = queries @ np.asarray(matrix[start:start + block_rows]).T  # (queries, block)
+        keep = min(k, scores.shape[1])
+        candidates = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+        for q in range(len(queries)):
+            merged_rows = np.concatenate([best_rows[q], candidates[q] + start])
+            merged_scores = np.concatenate([best_scores[q], scores[q, candidates[q]]])
+            if len(merged_rows) > k:
+                chosen = np.argpartition(-merged_scores, k - 1)[:k]
+                merged_rows, merged_scores = merged_rows[chosen], merged_scores[chosen]
+            best_rows[q], best_scores[q] = merged_rows, merged_scores
+
+    results = []
+    for found, scores in zip(best_rows, best_scores):
+        order = np.argsort(-scores, kind="stable")
+        results.append((found[order], scores[order]))
+    return results
+
+class SearchIndex:
+    """Append-only memory-mapped vector matrix keyed by memory id"""
+
+    def __init__(self, directory=SEARCH_DIR, dim=SEARCH_DIM):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.ids_path = os.path.join(directory, "ids.i64")
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()  # One sync at a time, so ids are never appended twice
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        else:
+            meta = {"dim": dim, "rows": 0, "capacity": INITIAL_ROWS, "last_id": 0}
+        self.dim = meta["dim"]
+        self.rows = meta["rows"]
+        self.last_id = meta["last_id"]
+        self._open(meta["capacity"])
+        if not os.path.exists(self.meta_path):
+            self._write_meta()
+
+    def __len__(self):
+        return self.rows
+
+    def _open(self, capacity):
+        # Growing a file keeps its rows; np.memmap maps the new size
+        for path, item_size in ((self.vectors_path, 4 * self.dim), (self.ids_path, 8)):
+            with open(path, 'ab') as f:
+                if f.tell() < capacity * item_size:
+                    f.truncate(capacity * item_size)
+        self.capacity = capacity
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+        self.ids = np.memmap(self.ids_path, dtype=np.int64, mode='r+', shape=(capacity,))
+
+    def _write_meta(self):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"dim": self.dim, "rows": self.rows, "capacity": self.capacity, "last_id": self.last_id}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def append(self, ids, vectors):
+        """Append rows; ids must be increasing and newer than every id already indexed"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        with self._lock:
+            if ids[0] <= self.last_id or np.any(np.diff(ids) <= 0):
+                raise ValueError("Search index ids must be appended in increasing order")
+            needed = self.rows + len(ids)
+            if needed > self.capacity:
+                capacity = self.capacity
+                while capacity < needed:
+                    capacity *= 2
+                self._open(capacity)
+            self.vectors[self.rows:needed] = vectors
+            self.ids[self.rows:needed] = ids
+            self.vectors.flush()
+            self.ids.flush()
+            self.rows = needed
+            self.last_id = int(ids[-1])
+            self._write_meta()
+
+    def vector(self, memory_id):
+        """Stored vector of a memory, None if it is not indexed"""
+        with self._lock:
+            ids = self.ids[:self.rows]
+            row = int(np.searchsorted(ids, memory_id))
+            if row < self.rows and ids[row] == memory_id:
+                return np.array(self.vectors[row])
+        return None
+
+    def search(self, queries, k=10):
+        """Top k (memory id, score) pairs for each query vector"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        with self._lock:
+            # Rows below self.rows never change, so the scan itself needs no lock
+            vectors, ids = self.vectors[:self.rows], self.ids[:self.rows]
+        return [[(int(ids[row]), float(score)) for row, score in zip(found, scores)]
+                for found, scores in top_k(vectors, queries, k)]
+
+    def sync(self, path=memory.MEMORY_DB):
+        """Embed and append every memory newer than the index, returns how many were added"""
+        added = 0
+        with self._sync_lock, closing(memory.connect(path)) as conn:
+            while True:
+                rows = conn.execute("SELECT id, message FROM memories WHERE id > ? ORDER BY id LIMIT ?",
+                                    (self.last_id, SYNC_BATCH)).fetchall()
+                if not rows:
+                    return added
+                self.append([row["id"] for row in rows], embed_batch([row["message"] for row in rows], self.dim))
+                added += len(rows)
+
+_default_index = None
+_default_lock = threading.Lock()
+
+def default_index():
+    """The process-wide index in SEARCH_DIR, opened on first use"""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = SearchIndex()
+        return _default_index
+
+def indexer_loop(stop_event, interval=SEARCH_SYNC_INTERVAL, path=memory.MEMORY_DB):
+    """Background thread body: embed new memories every interval seconds
+
+    The first pass over an existing history can take a while; searches sync
+    too, so they never miss rows the loop has not reached yet.
+    """
+    while not stop_event.wait(interval):
+        try:
+            added = default_index().sync(path)
+            if added > 100:
+                print(f"🔎 Indexed {added} memories for search")
+        except Exception as e:
+            print(f"Search index error: {e}")
+
+def search_memories(query=None, like=None, k=10, index=None, path=memory.MEMORY_DB):
+    """Memories most similar to a text query or to an indexed memory (by id)
+
+    Each result has the memory's id, speaker, timestamp (ms), message and
+    cosine similarity score; a `like` search leaves out the memory itself.
+    """
+    index = index or default_index()
+    index.sync(path)
+    if like is not None:
+        vector = index.vector(like)
+        if vector is None:
+            raise KeyError(f"Memory {like} is not indexed")
+        hits = [hit for hit in index.search(vector, k + 1)[0] if hit[0] != like][:k]
+    else:
+        hits = index.search(embed(query or "", index.dim), k)[0]
+    if not hits:
+        return []
+
+    with closing(memory.connect(path)) as conn:
+        rows = {row["id"]: row for row in conn.execute(
+            f"SELECT id, speaker, message, timestamp FROM memories WHERE id IN ({','.join('?' * len(hits))})",
+            [memory_id for memory_id, _ in hits])}
+    return [{
+        "id": memory_id,
+        "speaker": rows[memory_id]["speaker"],
+        "timestamp": rows[memory_id]["timestamp"],
+        "message": rows[memory_id]["message"],
+        "score": round(score, 4)
+    } for memory_id, score in hits if memory_id in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description="Search stored analyses by meaning")
+    parser.add_argument("query", nargs="?", help="Text to search for")
+    parser.add_argument("--like", type=int, help="Find memories similar to this memory id instead")
+    parser.add_argument("-k", type=int, default=10, help="Number of results")
+    parser.add_argument("--db", default=memory.MEMORY_DB, help="SQLite memory database")
+    args = parser.parse_args()
+    if args.query is None and args.like is None:
+        parser.error("give a query or --like MEMORY_ID")
+
+    index = SearchIndex()
+    added = index.sync(args.db)
+    print(f"🔎 {len(index)} memories indexed ({added} new)\n")
+    for result in search_memories(args.query, args.like, args.k, index, args.db):
+        when = datetime.fromtimestamp(result["timestamp"] / 1000).strftime("%Y-%m-%d %H:%M")
+        print(f"{result['score']:.3f}  #{result['id']} {when} [{result['speaker']}] "
+              f"{' '.join(result['message'].split())[:120]}")
+
+if __name__ == "__main__":
+    main()
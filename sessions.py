@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Monitoring sessions
+Each session has its own capture config and statistics; its captures run on
+a warm capture process lent by the worker supervisor.
+
+Frames a stopped session never got analyzed are kept in PENDING_FILE and
+resumed the next time a session with the same id starts.
+"""
+
+import os
+import json
+import time
+import threading
+
+PENDING_FILE = os.getenv('PENDING_FILE', 'screenshots/pending_frames.json')
+_pending_lock = threading.Lock()
+
+DEFAULT_SESSION_CONFIG = {
+    "source": "live",     # "live" screen capture, "replay" of recorded screenshots or "remote" agent
+    "monitor": 1,         # MSS monitor index (1 = primary)
+    "interval": 5.0,      # Seconds between captures
+    "replay_path": None,  # Directory, .zip or .tar of PNGs for replay sessions
+    "replay_speed": 1.0,  # Replay speed multiplier, 0 = as fast as possible
+    "replay_loop": False, # Start over when the recording is exhausted
+    "weight": 1.0,        # Fair-share weight in the analysis scheduler
+    "max_pending": 5,     # Frames queued for analysis before the oldest is dropped
+    "max_in_flight": None, # Max concurrent analyses for this session (None = pool size)
+    "storage": "png"      # "png" keeps every frame as a file; "archive" writes local captures only to
+                          # frame_archive.py, and analysis reads them back from there
+}
+
+SOURCES = ("live", "replay", "remote")
+STORAGE_MODES = ("png", "archive")
+
+def validate_config(config):
+    """Check and convert client-supplied session config, raising ValueError for bad values
+
+    Clients send JSON, so numbers may arrive as strings; anything the
+    scheduler or capture worker would choke on later is refused here.
+    """
+    def number(key, convert, minimum, exclusive=False):
+        value = config[key]
+        if isinstance(value, bool):
+            raise ValueError(f"{key} must be a number")
+        try:
+            value = convert(value)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"{key} must be a number")
+        if convert is float and value != value:
+            raise ValueError(f"{key} must be a number")
+        if value < minimum or (exclusive and value == minimum):
+            raise ValueError(f"{key} must be {'greater than' if exclusive else 'at least'} {minimum}")
+        config[key] = value
+
+    if config["source"] not in SOURCES:
+        raise ValueError(f"source must be one of {', '.join(SOURCES)}")
+    if config["storage"] not in STORAGE_MODES:
+        raise ValueError(f"storage must be one of {', '.join(STORAGE_MODES)}")
+    number("weight", float, 0, exclusive=True)
+    number("interval", float, 0)
+    number("replay_speed", float, 0)
+    number("monitor", int, 0)
+    number("max_pending", int, 1)
+    if config["max_in_flight"] is not None:
+        number("max_in_flight", int, 1)
+    if config["replay_path"] is not None and not isinstance(config["replay_path"], str):
+        raise ValueError("replay_path must be a string")
+    if config["source"] == "replay" and not config["replay_path"]:
+        raise ValueError("Replay sessions need a replay_path")
+    if not isinstance(config["replay_loop"], bool):
+        raise ValueError("replay_loop must be true or false")
+    return config
+
+def new_stats():
+    """Fresh statistics dict"""
+    return {
+        "screenshots_taken": 0,
+        "analyses_completed": 0,
+        "analyses_failed": 0,
+        "analyses_cancelled": 0,  # Stopped before they finished, saved for resume
+        "total_analysis_time": 0,
+        "start_time": None,
+        "screenshots": [],  # Store recent screenshots info
+        "bytes_received": 0,  # Encoded frame bytes pushed by a remote capture agent
+        "baseline": {"frames": 0, "bytes": 0, "png_bytes": 0, "json_bytes": 0}  # Agent-measured samples
+    }
+
+def summarize_stats(stats, start_time=None):
+    """Turn a raw stats dict into the payload sent to dashboards"""
+    runtime = 0
+    start_time = start_time or stats["start_time"]
+    if start_time:
+        runtime = time.time() - start_time
+
+    avg_analysis_time = 0
+    if stats["analyses_completed"] > 0:
+        avg_analysis_time = stats["total_analysis_time"] / stats["analyses_completed"]
+
+    success_rate = 0
+    total_analyses = stats["analyses_completed"] + stats["analyses_failed"]
+    if total_analyses > 0:
+        success_rate = (stats["analyses_completed"] / total_analyses) * 100
+
+    return {
+        'screenshots_taken': stats["screenshots_taken"],
+        'analyses_completed': stats["analyses_completed"],
+        'analyses_failed': stats["analyses_failed"],
+        'analyses_cancelled': stats["analyses_cancelled"],
+        'avg_analysis_time': round(avg_analysis_time, 2),
+        'success_rate': round(success_rate, 1),
+        'runtime': round(runtime, 1)
+    }
+
+def _read_pending(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        print(f"⚠️ Ignoring unreadable pending frames file {path}: {e}")
+        return {}
+
+def _write_pending(path, pending):
+    # Write a temp file and rename it, so a crash never leaves half a queue behind
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(pending, f)
+    os.replace(tmp_path, path)
+
+def save_pending(session_id, frames, path=PENDING_FILE):
+    """Persist frames of a stopped session for resume, returns how many were saved
+
+    Only what is needed to queue a frame again is kept: its number, the
+    stored file (or the archive holding it) and the id and wall time of its trace.
+    """
+    entries = [{
+        "screenshot_num": frame["screenshot_num"],
+        "filepath": frame["filepath"],
+        "archive_dir": frame.get("archive_dir"),
+        "trace_id": frame["trace"]["trace_id"],
+        "wall_time": frame["trace"]["wall_time"]
+    } for frame in frames]
+    if not entries:
+        return 0
+    with _pending_lock:
+        pending = _read_pending(path)
+        pending.setdefault(session_id, []).extend(entries)
+        _write_pending(path, pending)
+    return len(entries)
+
+def take_pending(session_id, path=PENDING_FILE):
+    """Remove and return the persisted frames of a session, oldest first"""
+    with _pending_lock:
+        pending = _read_pending(path)
+        frames = pending.pop(session_id, [])
+        if frames:
+            _write_pending(path, pending)
+    return sorted(frames, key=lambda frame: frame["wall_time"])
+
+class MonitoringSession:
+    """One capture source feeding the shared analysis scheduler"""
+
+    def __init__(self, session_id, config=None):
+        """Raises ValueError for an invalid config, see validate_config"""
+        self.session_id = session_id
+        self.config = dict(DEFAULT_SESSION_CONFIG)
+        self.config.update({k: v for k, v in (config or {}).items() if k in DEFAULT_SESSION_CONFIG})
+        validate_config(self.config)
+        self.stats = new_stats()
+        self.supervisor = None
+        self.remote_sid = None  # Socket.IO sid of the connected capture agent
+
+    @property
+    def is_remote(self):
+        return self.config["source"] == "remote"
+
+    def start(self, supervisor):
+        """Reset stats and start capturing (remote sessions are fed by their agent)
+
+        Returns "warm" or "cold" depending on whether a capture process had
+        to be spawned, None for remote sessions.
+        """
+        self.stats = new_stats()
+        self.stats["start_time"] = time.time()
+        if self.is_remote:
+            return None
+        self.supervisor = supervisor
+        return supervisor.assign(self.session_id, self.config)
+
+    def stop(self):
+        """Stop capturing; returns at once, the capture process finishes its frame and idles"""
+        self.remote_sid = None
+        if self.supervisor:
+            self.supervisor.release(self.session_id)
+
+    def is_alive(self):
+        if self.is_remote:
+            return self.remote_sid is not None
+        return self.supervisor is not None and self.supervisor.is_running(self.session_id)
+
+    def record_screenshot(self, screenshot_info):
+        self.stats["screenshots_taken"] += 1
+
+        # Keep only last 10 screenshots
+        self.stats["screenshots"].append(screenshot_info)
+        if len(self.stats["screenshots"]) > 10:
+            self.stats["screenshots"].pop(0)
+
+    def record_analysis(self, data):
+        if data["result"].get("cancelled"):
+            self.stats["analyses_cancelled"] += 1
+        elif data["result"]["success"]:
+            self.stats["analyses_completed"] += 1
+            self.stats["total_analysis_time"] += data["analyze_time"]
+        else:
+            self.stats["analyses_failed"] += 1
+
+    def record_remote_frame(self, num_bytes, baseline=None):
+        self.stats["bytes_received"] += num_bytes
+        if baseline:
+            sample = self.stats["baseline"]
+            sample["frames"] += 1
+            sample["bytes"] += num_bytes
+            sample["png_bytes"] += baseline["png_bytes"]
+            sample["json_bytes"] += baseline["json_bytes"]
+
+    def get_stats(self):
+        summary = summarize_stats(self.stats)
+        summary['config'] = self.config
+        summary['running'] = self.is_alive()
+
+        if self.is_remote:
+            # Savings come from frames where the agent measured the same frame as a
+            # PNG and as a base64-PNG JSON message (the pre-agent transport)
+            received = self.stats["bytes_received"]
+            sample = self.stats["baseline"]
+            runtime = summary['runtime'] or 1
+            summary['transfer'] = {
+                'frames_per_sec': round(self.stats["screenshots_taken"] / runtime, 3),
+                'kb_received': round(received / 1024, 1),
+                'kb_per_sec': round(received / 1024 / runtime, 1),
+                'baseline_frames': sample["frames"],
+                'base64_json_kb_per_frame': round(sample["json_bytes"] / sample["frames"] / 1024, 1) if sample["frames"] else 0,
+                'binary_saving': round((1 - sample["png_bytes"] / sample["json_bytes"]) * 100, 1) if sample["json_bytes"] else 0,
+                'codec_saving': round((1 - sample["bytes"] / sample["png_bytes"]) * 100, 1) if sample["png_bytes"] else 0,
+                'total_saving': round((1 - sample["bytes"] / sample["json_bytes"]) * 100, 1) if sample["json_bytes"] else 0
+            }
+        return summary
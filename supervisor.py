@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Worker supervisor
+Forks the analysis pool and a set of capture processes once, when the server
+starts, and keeps them warm between sessions: modules imported, HTTP
+connection pool and screen capturer open. Starting a session hands an idle
+capture process an assignment; stopping it moves that process's generation
+number on. Neither waits for a process, so Socket.IO handlers never block
+on spawn or join.
+
+Control latency (command until the capture process confirms it is running
+or idle again) is recorded in the worker_control_seconds histogram: "warm"
+for a pre-forked process, "cold" when a process had to be spawned first or
+was torn down.
+"""
+
+import time
+import threading
+import multiprocessing
+from workers import analysis_worker, capture_worker, DEFAULT_MODEL
+import metrics
+
+CANCEL_SLOTS = 256  # Ring of recently cancelled scheduler slots shared with the analysis workers
+
+class WorkerSupervisor:
+    """Owns the shared queues, the analysis pool and the warm capture processes"""
+
+    def __init__(self, analysis_workers=2, capture_workers=2):
+        self.analysis_workers = analysis_workers
+        self.capture_workers = capture_workers  # Pre-forked; more are spawned (cold) on demand
+        self.frame_queue = None
+        self.analysis_queue = None
+        self.result_queue = None
+        self.stop_event = None
+        self.cancelled = None
+        self._cancel_index = 0
+        self.analysis_processes = []
+        self.workers = []  # Capture processes, see _spawn_capture_worker
+        self._assignments = {}  # session_id -> capture worker running it
+        self._next_generation = 1
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.stop_event is not None
+
+    def start(self):
+        """Fork the analysis pool and the idle capture processes, False if already running"""
+        with self._lock:
+            if self.running:
+                return False
+            self.frame_queue = multiprocessing.Queue()
+            self.analysis_queue = multiprocessing.Queue()
+            self.result_queue = multiprocessing.Queue()
+            self.stop_event = multiprocessing.Event()
+            self.cancelled = multiprocessing.Array('q', [-1] * CANCEL_SLOTS)
+
+            for _ in range(self.analysis_workers):
+                process = multiprocessing.Process(
+                    target=analysis_worker,
+                    args=(self.analysis_queue, self.result_queue, self.stop_event, DEFAULT_MODEL, self.cancelled),
+                    daemon=True
+                )
+                process.start()
+                self.analysis_processes.append(process)
+
+            for _ in range(self.capture_workers):
+                self._spawn_capture_worker()
+            return True
+
+    def _spawn_capture_worker(self):
+        worker = {
+            "id": len(self.workers) + 1,
+            "control": multiprocessing.Queue(),
+            "generation": multiprocessing.Value('i', 0),  # Assignment it may run, 0 = none
+            "wake": multiprocessing.Event(),  # Interrupts the capture interval on release
+            "session_id": None,
+            "assigned": 0,
+            "start_requested": None,  # (monotonic time, mode) until the worker reports running
+            "stop_requested": None    # (monotonic time, generation) until it reports idle
+        }
+        worker["process"] = multiprocessing.Process(
+            target=capture_worker,
+            args=(worker["id"], worker["control"], worker["generation"], worker["wake"],
+                  self.frame_queue, self.result_queue),
+            daemon=True
+        )
+        worker["process"].start()
+        self.workers.append(worker)
+        return worker
+
+    def assign(self, session_id, config):
+        """Start capturing for a session on an idle warm process (spawning one if none is idle)"""
+        with self._lock:
+            self._release(session_id)
+            requested = time.monotonic()
+            worker = next((w for w in self.workers if w["session_id"] is None and w["process"].is_alive()), None)
+            mode = "warm"
+            if worker is None:
+                worker = self._spawn_capture_worker()
+                mode = "cold"
+
+            generation = self._next_generation
+            self._next_generation += 1
+            worker["session_id"] = session_id
+            worker["assigned"] = generation
+            worker["start_requested"] = (requested, mode)
+            worker["generation"].value = generation
+            worker["control"].put({"session_id": session_id, "config": config, "generation": generation})
+            self._assignments[session_id] = worker
+            return mode
+
+    def release(self, session_id):
+        """Stop capturing for a session without waiting for the process"""
+        with self._lock:
+            return self._release(session_id)
+
+    def _release(self, session_id):
+        worker = self._assignments.pop(session_id, None)
+        if worker is None:
+            return False
+        with worker["generation"].get_lock():
+            if worker["generation"].value == worker["assigned"]:
+                worker["generation"].value = 0
+                worker["stop_requested"] = (time.monotonic(), worker["assigned"])
+        worker["wake"].set()
+        worker["session_id"] = None
+        return True
+
+    def cancel(self, slots):
+        """Cancel analyses by scheduler slot: running ones are abandoned, queued ones skipped"""
+        if not self.running or not slots:
+            return
+        with self.cancelled.get_lock():
+            for slot in slots:
+                self.cancelled[self._cancel_index % CANCEL_SLOTS] = slot
+                self._cancel_index += 1
+
+    def is_running(self, session_id):
+        worker = self._assignments.get(session_id)
+        return (worker is not None and worker["generation"].value == worker["assigned"]
+                and worker["process"].is_alive())
+
+    def on_worker_state(self, message):
+        """Handle a worker_state message from the result queue, returns (action, mode, seconds) or None"""
+        with self._lock:
+            worker = self.workers[message["worker_id"] - 1]
+            observed = None
+            if message["state"] == "running":
+                if worker["start_requested"] and message["generation"] == worker["assigned"]:
+                    requested, mode = worker["start_requested"]
+                    worker["start_requested"] = None
+                    observed = ("start", mode, message["at"] - requested)
+            elif message["state"] == "idle":
+                if worker["stop_requested"] and worker["stop_requested"][1] == message["generation"]:
+                    observed = ("stop", "warm", message["at"] - worker["stop_requested"][0])
+                    worker["stop_requested"] = None
+                # The assignment ended by itself (replay finished, capture error): free the process
+                if worker["session_id"] is not None and message["generation"] == worker["assigned"]:
+                    self._assignments.pop(worker["session_id"], None)
+                    worker["session_id"] = None
+
+        if observed:
+            action, mode, seconds = observed
+            metrics.worker_control.observe(seconds, action=action, mode=mode)
+        return observed
+
+    def shutdown(self):
+        """Tear every process down (server exit); the joins are recorded as cold stops"""
+        with self._lock:
+            if not self.running:
+                return
+            self.stop_event.set()
+            for _ in self.analysis_processes:
+                self.analysis_queue.put(None)  # Poison pill
+            for worker in self.workers:
+                worker["generation"].value = 0
+                worker["wake"].set()
+                worker["control"].put(None)
+
+            for process in self.analysis_processes + [w["process"] for w in self.workers]:
+                stop_start = time.monotonic()
+                process.join(timeout=2)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+                metrics.worker_control.observe(time.monotonic() - stop_start, action="stop", mode="cold")
+
+            self.analysis_processes = []
+            self.workers = []
+            self._assignments = {}
+            self.stop_event = None
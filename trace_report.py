@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Frame Trace Report
+Summarizes the JSONL traces written by the web dashboard into a per-stage
+latency breakdown and a critical-path report, or converts them to the
+Chrome trace format (load in chrome://tracing or ui.perfetto.dev)
+
+Usage:
+    python trace_report.py [traces/traces.jsonl] [--session ID] [--chrome out.json]
+"""
+
+import os
+import json
+import math
+import argparse
+from tracing import TRACE_FILE
+
+def load_traces(path, session_id=None):
+    """Read a trace file plus its rotated backups, oldest first"""
+    backups = []
+    while os.path.exists(f"{path}.{len(backups) + 1}"):
+        backups.append(f"{path}.{len(backups) + 1}")
+    paths = backups[::-1] + [path]
+
+    traces = []
+    for trace_path in paths:
+        if not os.path.exists(trace_path):
+            continue
+        with open(trace_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    trace = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially written line at the end of a live file
+                if session_id is None or trace.get("session_id") == session_id:
+                    traces.append(trace)
+    return traces
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def critical_path(trace):
+    """Split a trace's end-to-end time between stages
+
+    Spans are walked in start order; overlapping time is charged to the span
+    that started first, and time not covered by any span is "untracked".
+    Returns ([(stage, seconds)], end_to_end_seconds).
+    """
+    spans = sorted(trace["spans"], key=lambda s: s["start"])
+    if not spans:
+        return [], 0.0
+
+    path = []
+    cursor = spans[0]["start"]
+    for span in spans:
+        if span["start"] > cursor:
+            path.append(("untracked", span["start"] - cursor))
+            cursor = span["start"]
+        if span["end"] > cursor:
+            path.append((span["name"], span["end"] - cursor))
+            cursor = span["end"]
+    return path, cursor - spans[0]["start"]
+
+def stage_order(traces):
+    """Stage names in the order they first appear in the pipeline"""
+    order = []
+    for trace in traces:
+        for span in sorted(trace["spans"], key=lambda s: s["start"]):
+            if span["name"] not in order:
+                order.append(span["name"])
+    return order
+
+def generate_report(traces):
+    """Markdown stage breakdown and critical-path report"""
+    completed = [t for t in traces if t.get("status") not in ("dropped", "cancelled") and t["spans"]]
+    dropped = sum(1 for t in traces if t.get("status") == "dropped")
+    cancelled = sum(1 for t in traces if t.get("status") == "cancelled")
+
+    markdown = "# Frame Trace Report\n\n"
+    markdown += (f"- Traces: {len(traces)} ({len(completed)} analyzed, {dropped} dropped by the scheduler, "
+                 f"{cancelled} cancelled by a stop)\n")
+    if not completed:
+        return markdown
+
+    durations = {}
+    contributions = {}
+    end_to_end = []
+    for trace in completed:
+        for span in trace["spans"]:
+            durations.setdefault(span["name"], []).append(span["end"] - span["start"])
+        path, total = critical_path(trace)
+        end_to_end.append(total)
+        for stage, seconds in path:
+            contributions[stage] = contributions.get(stage, 0.0) + seconds
+
+    end_to_end.sort()
+    total_time = sum(end_to_end)
+    markdown += f"- End-to-end (capture start → emitted): mean {total_time / len(end_to_end) * 1000:.1f}ms, "
+    markdown += f"p50 {percentile(end_to_end, 50) * 1000:.1f}ms, p95 {percentile(end_to_end, 95) * 1000:.1f}ms, "
+    markdown += f"p99 {percentile(end_to_end, 99) * 1000:.1f}ms\n\n"
+
+    markdown += "## Stage Breakdown\n\n"
+    markdown += "| Stage | Count | Mean (ms) | p50 (ms) | p95 (ms) | p99 (ms) | Max (ms) |\n"
+    markdown += "|-------|-------|-----------|----------|----------|----------|----------|\n"
+    order = stage_order(completed)
+    for stage in order:
+        values = sorted(durations[stage])
+        mean = sum(values) / len(values)
+        markdown += (f"| {stage} | {len(values)} | {mean * 1000:.1f} | {percentile(values, 50) * 1000:.1f} | "
+                     f"{percentile(values, 95) * 1000:.1f} | {percentile(values, 99) * 1000:.1f} | {values[-1] * 1000:.1f} |\n")
+
+    markdown += "\n## Critical Path\n\n"
+    markdown += "Where each second of end-to-end latency goes (overlaps charged to the earlier span).\n\n"
+    markdown += "| Stage | Mean per frame (ms) | Share |\n"
+    markdown += "|-------|---------------------|-------|\n"
+    for stage in sorted(contributions, key=lambda s: -contributions[s]):
+        share = contributions[stage] / total_time * 100 if total_time else 0
+        markdown += f"| {stage} | {contributions[stage] / len(completed) * 1000:.1f} | {share:.1f}% |\n"
+
+    slowest = max(completed, key=lambda t: critical_path(t)[1])
+    path, total = critical_path(slowest)
+    markdown += f"\n### Slowest frame: {slowest['trace_id']} ({slowest['session_id']} #{slowest['screenshot_num']}, {total * 1000:.1f}ms)\n\n"
+    markdown += " → ".join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in path) + "\n"
+
+    return markdown
+
+def to_chrome_trace(traces):
+    """Chrome trace event format: one row per session/process, one slice per span"""
+    events = []
+    for trace in traces:
+        for span in trace["spans"]:
+            events.append({
+                "name": span["name"],
+                "cat": trace.get("status", ""),
+                "ph": "X",
+                "ts": span["start"] * 1e6,
+                "dur": (span["end"] - span["start"]) * 1e6,
+                "pid": trace["session_id"],
+                "tid": span["proc"],
+                "args": {"trace_id": trace["trace_id"], "screenshot_num": trace["screenshot_num"]}
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize frame traces")
+    parser.add_argument("path", nargs="?", default=TRACE_FILE, help="Trace JSONL file (rotated backups are included)")
+    parser.add_argument("--session", help="Only include traces from this session")
+    parser.add_argument("--chrome", metavar="OUT", help="Write Chrome trace format JSON instead of the report")
+    args = parser.parse_args()
+
+    traces = load_traces(args.path, args.session)
+
+    if args.chrome:
+        with open(args.chrome, 'w') as f:
+            json.dump(to_chrome_trace(traces), f)
+        print(f"Wrote {len(traces)} traces to {args.chrome}")
+    else:
+        print(generate_report(traces))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Per-frame tracing
+Every captured frame carries a trace dict through the pipeline. Each stage
+appends a span with monotonic start/end timestamps (time.monotonic is
+system-wide, so spans from different processes line up), and every queue
+hop is recorded as a "<queue>_wait" span. Finished traces are written to a
+rotating JSONL file; trace_report.py summarizes them.
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces/traces.jsonl')
+TRACE_MAX_BYTES = int(os.getenv('TRACE_MAX_BYTES', str(10 * 1024 * 1024)))
+TRACE_BACKUPS = int(os.getenv('TRACE_BACKUPS', '5'))
+
+def new_trace(session_id, screenshot_num):
+    """Start a trace for a freshly captured frame"""
+    return {
+        "trace_id": uuid.uuid4().hex[:16],
+        "session_id": session_id,
+        "screenshot_num": screenshot_num,
+        "wall_time": time.time(),
+        "spans": []
+    }
+
+def add_span(trace, name, start, end, proc):
+    """Record a finished span and return it"""
+    span = {"name": name, "start": start, "end": end, "proc": proc}
+    trace["spans"].append(span)
+    return span
+
+@contextmanager
+def span(trace, name, proc):
+    """Time the body of a with-block as a span"""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        add_span(trace, name, start, time.monotonic(), proc)
+
+def mark_enqueued(trace, queue_name):
+    """Note that the frame was put on a queue"""
+    trace["enqueued"] = [queue_name, time.monotonic()]
+
+def mark_dequeued(trace, proc):
+    """Close the pending queue hop as a "<queue>_wait" span"""
+    pending = trace.pop("enqueued", None)
+    if pending:
+        queue_name, start = pending
+        add_span(trace, f"{queue_name}_wait", start, time.monotonic(), proc)
+
+class TraceWriter:
+    """Append finished traces to a size-rotated JSONL file"""
+
+    def __init__(self, path=TRACE_FILE, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # A private logger gives us thread-safe writes and rotation from the standard library
+        self._logger = logging.getLogger(f"trace_writer.{os.path.abspath(path)}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        if not self._logger.handlers:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._logger.addHandler(handler)
+
+    def write(self, trace, status):
+        record = dict(trace)
+        record.pop("enqueued", None)
+        record["status"] = status
+        self._logger.info(json.dumps(record, separators=(',', ':')))
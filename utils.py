@@ -7,7 +7,12 @@ import time
 import base64
 import io
 import os
+import json
+import socket
+import weakref
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 from PIL import Image
 import mss
 from dotenv import load_dotenv
@@ -15,13 +20,85 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-def capture_screenshot():
-    """Capture screenshot using MSS"""
-    with mss.mss() as sct:
-        monitor = sct.monitors[1]  # Primary monitor
-        screenshot_raw = sct.grab(monitor)
-        screenshot = Image.frombytes("RGB", screenshot_raw.size, screenshot_raw.bgra, "raw", "BGRX")
-    return screenshot
+# One HTTP connection pool per process, so warm analysis workers reuse their connections
+_http_session = None
+_http_session_pid = None
+_busy_connections = weakref.WeakSet()  # Connections checked out of the pool by a request in progress
+
+class _TrackedPoolMixin:
+    """Connection pool that remembers which of its connections requests are using"""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        _busy_connections.add(conn)
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            _busy_connections.discard(conn)
+        super()._put_conn(conn)
+
+class _TrackedHTTPConnectionPool(_TrackedPoolMixin, urllib3.HTTPConnectionPool):
+    pass
+
+class _TrackedHTTPSConnectionPool(_TrackedPoolMixin, urllib3.HTTPSConnectionPool):
+    pass
+
+TRACKED_POOLS = {"http": _TrackedHTTPConnectionPool, "https": _TrackedHTTPSConnectionPool}
+
+class _AbortableAdapter(HTTPAdapter):
+    """HTTPAdapter whose requests in progress abort_http_requests() can cut off"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = TRACKED_POOLS
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        manager.pool_classes_by_scheme = TRACKED_POOLS
+        return manager
+
+def http_session():
+    """requests.Session for this process (a forked child never shares its parent's sockets)"""
+    global _http_session, _http_session_pid
+    if _http_session is None or _http_session_pid != os.getpid():
+        _http_session = requests.Session()
+        adapter = _AbortableAdapter()
+        _http_session.mount("https://", adapter)
+        _http_session.mount("http://", adapter)
+        _http_session_pid = os.getpid()
+    return _http_session
+
+def abort_http_requests():
+    """Shut down the sockets of this process's requests in progress, returns how many
+
+    The blocked request fails at once with a connection error and urllib3
+    discards the connection; idle pooled connections stay warm. A request
+    that has not opened its socket yet is not affected.
+    """
+    aborted = 0
+    for conn in list(_busy_connections):
+        sock = getattr(conn, "sock", None)
+        if sock is None:
+            continue
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+            aborted += 1
+        except (OSError, AttributeError):
+            pass
+    return aborted
+
+def capture_screenshot(monitor_index=1, sct=None):
+    """Capture screenshot using MSS (monitor 1 is the primary monitor)
+
+    Pass an open mss instance to reuse it; otherwise one is opened per call.
+    """
+    if sct is None:
+        with mss.mss() as sct:
+            return capture_screenshot(monitor_index, sct)
+    monitor = sct.monitors[monitor_index]
+    screenshot_raw = sct.grab(monitor)
+    return Image.frombytes("RGB", screenshot_raw.size, screenshot_raw.bgra, "raw", "BGRX")
 
 def resize_to_1536x864(image):
     """Resize image to 1536x864 maintaining aspect ratio"""
@@ -43,14 +120,104 @@ def image_to_base64(image):
     buffer.seek(0)
     return base64.b64encode(buffer.read()).decode('utf-8')
 
+def encoded_image_mime_type(data):
+    """MIME type of already encoded image bytes (PNG, JPEG or WebP)"""
+    if data[:4] == b'\x89PNG':
+        return "image/png"
+    if data[:3] == b'\xff\xd8\xff':
+        return "image/jpeg"
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return "image/webp"
+    raise ValueError("Unsupported image encoding (expected PNG, JPEG or WebP)")
+
+def image_to_data_url(image):
+    """data: URL for a PIL Image (encoded as PNG) or already encoded image bytes
+
+    Frames pushed by remote capture agents arrive encoded, so they are
+    base64'd as-is instead of being decoded and re-encoded.
+    """
+    if isinstance(image, (bytes, bytearray)):
+        return f"data:{encoded_image_mime_type(image)};base64,{base64.b64encode(image).decode('utf-8')}"
+    return f"data:image/png;base64,{image_to_base64(image)}"
+
+def encode_image(image, image_format="png", quality=85):
+    """Encode a PIL Image as PNG, WebP or JPEG bytes (quality 100 = lossless WebP)"""
+    buffer = io.BytesIO()
+    if image_format == "png":
+        image.save(buffer, format='PNG')
+    elif image_format == "webp":
+        image.save(buffer, format='WEBP', quality=quality, lossless=quality >= 100)
+    elif image_format in ("jpeg", "jpg"):
+        image.save(buffer, format='JPEG', quality=quality)
+    else:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    return buffer.getvalue()
+
+class _TimedBody(io.BytesIO):
+    """Request body that records when the HTTP client has finished reading (uploading) it"""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.finished_at = None
+
+    def read(self, *args):
+        chunk = super().read(*args)
+        if not chunk and self.finished_at is None:
+            self.finished_at = time.monotonic()
+        return chunk
+
+def classify_error(error):
+    """Short, low-cardinality error class for metrics (e.g. http_429, timeout)"""
+    if isinstance(error, requests.Timeout):
+        return "timeout"
+    if isinstance(error, requests.ConnectionError):
+        return "connection"
+    if isinstance(error, Exception):
+        return type(error).__name__
+    if isinstance(error, str) and error.startswith("HTTP "):
+        return "http_" + error[5:8]
+    return "other"
+
+def mock_analysis(screenshot, screenshot_num, model="mock"):
+    """Local stand-in for the vision model, for replay runs and headless CI
+
+    Still does the real image encode; "mock:0.5" adds 0.5s of model latency.
+    """
+    encode_start = time.monotonic()
+    data_url = image_to_data_url(screenshot)
+    model_start = time.monotonic()
+    latency = float(model.split(':', 1)[1]) if ':' in model else 0.0
+    if latency > 0:
+        time.sleep(latency)
+    end = time.monotonic()
+    return {
+        "success": True,
+        "time": end - encode_start,
+        "response": f"SCREEN ELEMENTS: mock analysis of screenshot #{screenshot_num} ({len(data_url)} byte data URL)",
+        "error": None,
+        "error_class": None,
+        "timings": {"encode": [encode_start, model_start], "model": [model_start, end]}
+    }
+
 def analyze_screenshot_with_model(screenshot, screenshot_num, model="google/gemini-2.0-flash-exp:free"):
-    """Send screenshot to OpenRouter API for analysis"""
+    """Send screenshot to OpenRouter API for analysis
+
+    The result carries per-stage "timings" as [start, end] time.monotonic()
+    pairs: encode (PNG + base64), upload (request body sent) and model (body
+    sent until response received). Models named "mock" or "mock:<seconds>"
+    are answered locally by mock_analysis.
+    """
+    if model == "mock" or model.startswith("mock:"):
+        return mock_analysis(screenshot, screenshot_num, model)
+
     api_key = os.getenv('OPENROUTER_API_KEY')
     if not api_key:
         raise ValueError("OPENROUTER_API_KEY environment variable not set")
 
     # Convert image to base64
-    base64_image = image_to_base64(screenshot)
+    encode_start = time.monotonic()
+    data_url = image_to_data_url(screenshot)
+    timings = {"encode": [encode_start, time.monotonic()]}
 
     # Prepare the message content
     content = [
@@ -67,7 +234,7 @@ Be precise. Use technical terminology. Report only what is visible."""
         {
             "type": "image_url",
             "image_url": {
-                "url": f"data:image/png;base64,{base64_image}"
+                "url": data_url
             }
         }
     ]
@@ -88,15 +255,21 @@ Be precise. Use technical terminology. Report only what is visible."""
         "max_tokens": 1000
     }
 
+    body = _TimedBody(json.dumps(data).encode('utf-8'))
+
     start_time = time.time()
+    send_start = time.monotonic()
     try:
-        response = requests.post(
+        response = http_session().post(
             "https://openrouter.ai/api/v1/chat/completions",
             headers=headers,
-            json=data,
+            data=body,
             timeout=60
         )
         end_time = time.time()
+        uploaded_at = body.finished_at or send_start
+        timings["upload"] = [send_start, uploaded_at]
+        timings["model"] = [uploaded_at, time.monotonic()]
 
         if response.status_code == 200:
             result = response.json()
@@ -104,14 +277,19 @@ Be precise. Use technical terminology. Report only what is visible."""
                 "success": True,
                 "time": end_time - start_time,
                 "response": result['choices'][0]['message']['content'],
-                "error": None
+                "error": None,
+                "error_class": None,
+                "timings": timings
             }
         else:
+            error = f"HTTP {response.status_code}: {response.text}"
             return {
                 "success": False,
                 "time": end_time - start_time,
                 "response": None,
-                "error": f"HTTP {response.status_code}: {response.text}"
+                "error": error,
+                "error_class": classify_error(error),
+                "timings": timings
             }
     except Exception as e:
         end_time = time.time()
@@ -119,12 +297,57 @@ Be precise. Use technical terminology. Report only what is visible."""
             "success": False,
             "time": end_time - start_time,
             "response": None,
-            "error": str(e)
+            "error": str(e),
+            "error_class": classify_error(e),
+            "timings": timings
         }
 
+def summarize_with_model(previous, notes, model="google/gemini-2.0-flash-exp:free", max_words=150):
+    """Fold new notes into a running summary with a text-only model call
+
+    Returns the updated summary and raises on failure, so the caller can
+    retry the same notes later. Models named "mock" or "mock:<seconds>"
+    are answered locally by keeping an evenly thinned list of note lines.
+    """
+    if model == "mock" or model.startswith("mock:"):
+        latency = float(model.split(':', 1)[1]) if ':' in model else 0.0
+        if latency > 0:
+            time.sleep(latency)
+        lines = [line for line in previous.splitlines() if line.strip()]
+        lines += [note.splitlines()[0][:160] for note in notes if note.strip()]
+        max_lines = max(max_words // 10, 1)
+        if len(lines) > max_lines:
+            step = -(-len(lines) // max_lines)
+            lines = lines[::step]
+        return "\n".join(lines)
+
+    api_key = os.getenv('OPENROUTER_API_KEY')
+    if not api_key:
+        raise ValueError("OPENROUTER_API_KEY environment variable not set")
+
+    prompt = f"""You keep a running summary of what a person did at their computer.
+
+CURRENT SUMMARY:
+{previous or "(empty)"}
+
+NEW OBSERVATIONS:
+""" + "\n".join(f"- {note}" for note in notes) + f"""
+
+Rewrite the summary so it also covers the new observations. Keep it under {max_words} words, chronological, and name the applications, documents and topics involved. Reply with the summary only."""
+
+    response = http_session().post(
+        "https://openrouter.ai/api/v1/chat/completions",
+        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+        json={"model": model, "messages": [{"role": "user", "content": prompt}], "max_tokens": max_words * 3},
+        timeout=60
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    return response.json()['choices'][0]['message']['content'].strip()
+
 def save_screenshot(image, filename):
     """Save screenshot to file"""
-    os.makedirs("screenshots", exist_ok=True)
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
     image.save(filename)
     file_size_kb = os.path.getsize(filename) / 1024
     return file_size_kb
\ No newline at end of file
@@ -2,184 +2,227 @@
 """
 Web-based Live Screen Activity Monitor
 Real-time streaming dashboard with Flask + SocketIO
+
+Stopping a session (or the server) never kills an analysis mid-request:
+"drain" lets in-flight analyses finish and emit their results until a
+deadline, "abort" cancels them at once. Frames that were never analyzed,
+queued or cancelled, are persisted and resumed when the session starts again.
 """
 
 import time
 import os
-import multiprocessing
+import re
+import hmac
 import threading
 from datetime import datetime
-from flask import Flask, render_template, send_from_directory, request
+from flask import Flask, Response, jsonify, render_template, send_from_directory, request
 from flask_socketio import SocketIO, emit
 from queue import Empty
-from utils import capture_screenshot, resize_to_1536x864, analyze_screenshot_with_model, save_screenshot
+from scheduler import AnalysisScheduler
+from supervisor import WorkerSupervisor
+from sessions import MonitoringSession, new_stats, summarize_stats, save_pending, take_pending
+from tracing import TraceWriter, new_trace, span, mark_enqueued, mark_dequeued
+from utils import encoded_image_mime_type, classify_error
+import metrics
+import memory
+import search_index
+import frame_archive
 
 # Flask app setup
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'screenshot_monitor_secret'
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Largest encoded frame an agent may push. A 1536x864 PNG of a busy screen can
+# pass 1MB, Engine.IO's default message limit; the buffer also leaves room for
+# the base64 framing of the polling transport
+MAX_FRAME_BYTES = int(float(os.getenv('MAX_FRAME_MB', '8')) * 1024 * 1024)
+socketio = SocketIO(app, cors_allowed_origins="*", max_http_buffer_size=MAX_FRAME_BYTES * 4 // 3 + 64 * 1024)
+
+# Number of analysis worker processes shared by all sessions
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '2'))
+# Capture processes forked at startup; sessions beyond this spawn more
+CAPTURE_WORKERS = int(os.getenv('CAPTURE_WORKERS', '2'))
 
 # Global variables for process management
-screenshot_process = None
-analysis_process = None
+sessions = {}  # session_id -> MonitoringSession
+sessions_lock = threading.Lock()
+scheduler = AnalysisScheduler(capacity=ANALYSIS_WORKERS)
+supervisor = WorkerSupervisor(ANALYSIS_WORKERS, CAPTURE_WORKERS)
 monitor_thread = None
+dispatch_thread = None
 stop_event = None
+frame_queue = None
 analysis_queue = None
 result_queue = None
+trace_writer = None
+summarizer_thread = None
+indexer_thread = None
+
+# Recent screenshots across all sessions, replayed to newly connected clients
+recent_screenshots = []
+
+# Remote capture agents (capture_agent.py) connect on their own namespace
+AGENT_NAMESPACE = '/agent'
+agent_sids = {}  # Socket.IO sid -> session_id of the agent
+IMAGE_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+AGENT_STAGES = ("capture", "resize", "encode")  # Agent-side timings accepted as metrics
+AGENT_TOKEN = os.getenv('AGENT_TOKEN')  # Shared secret agents must present
+
+# How stop_monitoring and server exit treat analyses that are still running
+STOP_MODES = ("drain", "abort")
+STOP_MODE = os.getenv('STOP_MODE', 'drain')
+DRAIN_SECONDS = float(os.getenv('DRAIN_SECONDS', '30'))  # Drain deadline, then the rest is cancelled
+
+def dispatch_ready(analysis_queue):
+    """Move every frame the scheduler allows onto the shared analysis queue"""
+    while True:
+        item = scheduler.next_item()
+        if item is None:
+            break
+        mark_dequeued(item["trace"], "server")
+        mark_enqueued(item["trace"], "analysis_queue")
+        analysis_queue.put(item)
+
+def submit_frame(data):
+    """Queue a captured frame with the scheduler, returns True if an older frame was dropped"""
+    mark_enqueued(data["trace"], "scheduler")
+    dropped = scheduler.submit(data["session_id"], data)
+    if dropped is None:
+        return False
+    if dropped is data:
+        # The session was stopped while this frame was being captured: keep it for resume
+        mark_dequeued(data["trace"], "server")
+        save_pending(data["session_id"], [data])
+        return False
+
+    mark_dequeued(dropped["trace"], "server")
+    trace_writer.write(dropped["trace"], "dropped")
+    metrics.frames_dropped.inc(session=dropped['session_id'])
+    socketio.emit('status_update', {
+        'message': f"⏭️ [{dropped['session_id']}] Skipped analysis of screenshot #{dropped['screenshot_num']} (quota)",
+        'timestamp': datetime.now().strftime("%H:%M:%S")
+    })
+    return True
 
-# Statistics tracking
-stats = {
-    "screenshots_taken": 0,
-    "analyses_completed": 0,
-    "analyses_failed": 0,
-    "total_analysis_time": 0,
-    "start_time": None,
-    "screenshots": []  # Store recent screenshots info
-}
-
-def analysis_worker(analysis_queue, result_queue, stop_event):
-    """Worker process that handles AI analysis"""
+def dispatch_frames(frame_queue, analysis_queue, stop_event):
+    """Feed captured frames from all local sessions into the scheduler"""
     while not stop_event.is_set():
         try:
-            data = analysis_queue.get(timeout=1.0)
-            if data is None:  # Poison pill
-                break
-
-            screenshot_num = data["screenshot_num"]
-            screenshot = data["screenshot"]
-
-            # Analyze screenshot
-            analyze_start = time.time()
-            result = analyze_screenshot_with_model(screenshot, screenshot_num, model="google/gemini-2.0-flash-exp:free")
-            analyze_time = time.time() - analyze_start
-
-            # Send analysis result
-            result_queue.put({
-                "type": "analysis",
-                "screenshot_num": screenshot_num,
-                "analyze_time": analyze_time,
-                "result": result,
-                "timestamp": datetime.now().strftime("%H:%M:%S")
-            })
-
+            try:
+                data = frame_queue.get(timeout=0.2)
+                mark_dequeued(data["trace"], "server")
+                submit_frame(data)
+            except Empty:
+                pass
+            dispatch_ready(analysis_queue)
         except Exception as e:
-            if not stop_event.is_set():
-                result_queue.put({
-                    "type": "error",
-                    "message": f"Analysis worker error: {str(e)}",
-                    "timestamp": datetime.now().strftime("%H:%M:%S")
-                })
-
-def screenshot_worker(analysis_queue, result_queue, stop_event):
-    """Worker process that captures screenshots every 5 seconds"""
-    try:
-        screenshot_count = 0
-        next_capture_time = time.time()
-
-        while not stop_event.is_set():
-            current_time = time.time()
-
-            if current_time >= next_capture_time:
-                screenshot_count += 1
-
-                # Send status update
-                result_queue.put({
-                    "type": "status",
-                    "message": f"📸 Capturing screenshot #{screenshot_count}...",
-                    "timestamp": datetime.now().strftime("%H:%M:%S")
-                })
-
-                # Capture and process screenshot
-                screenshot = capture_screenshot()
-                resized_screenshot = resize_to_1536x864(screenshot)
-
-                # Save screenshot
-                timestamp = int(time.time())
-                filename = f"live_{timestamp}_{screenshot_count}.png"
-                filepath = f"screenshots/{filename}"
-                file_size_kb = save_screenshot(resized_screenshot, filepath)
-
-                # Send capture complete update
-                result_queue.put({
-                    "type": "screenshot",
-                    "screenshot_num": screenshot_count,
-                    "filename": filename,
-                    "filepath": filepath,
-                    "file_size_kb": file_size_kb,
-                    "timestamp": datetime.now().strftime("%H:%M:%S")
-                })
-
-                # Queue screenshot for analysis
-                analysis_queue.put({
-                    "screenshot_num": screenshot_count,
-                    "screenshot": resized_screenshot
-                })
-
-                # Schedule next capture
-                next_capture_time = current_time + 5.0
-
-            time.sleep(0.1)
-
-    except Exception as e:
-        result_queue.put({
-            "type": "error",
-            "message": f"Screenshot worker error: {str(e)}",
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        })
-
-def monitor_results():
+            # One bad frame or session must not stop analysis for everyone
+            print(f"Dispatch error: {e}")
+
+def publish_screenshot(session_id, screenshot_info, spans):
+    """Record a stored screenshot and push it to dashboards"""
+    session = sessions.get(session_id)
+    if session:
+        session.record_screenshot(screenshot_info)
+    metrics.frames_captured.inc(session=session_id)
+    metrics.observe_spans(spans)
+
+    # Keep only last 10 screenshots
+    recent_screenshots.append(screenshot_info)
+    if len(recent_screenshots) > 10:
+        recent_screenshots.pop(0)
+
+    socketio.emit('new_screenshot', screenshot_info)
+    socketio.emit('stats_update', get_current_stats())
+
+def monitor_results(result_queue, analysis_queue, stop_event):
     """Monitor result queue and emit to web clients"""
-    global stats
-
-    while result_queue and not stop_event.is_set():
+    while not stop_event.is_set():
         try:
             data = result_queue.get(timeout=0.5)
             timestamp = data.get("timestamp", datetime.now().strftime("%H:%M:%S"))
+            session_id = data.get("session_id")
+            session = sessions.get(session_id)
 
             if data["type"] == "status":
                 socketio.emit('status_update', {
                     'message': data['message'],
+                    'session_id': session_id,
                     'timestamp': timestamp
                 })
 
             elif data["type"] == "screenshot":
-                stats["screenshots_taken"] += 1
-                screenshot_info = {
+                publish_screenshot(session_id, {
                     'num': data['screenshot_num'],
+                    'session_id': session_id,
                     'filename': data['filename'],
                     'filepath': data['filepath'],
                     'size_kb': data['file_size_kb'],
                     'timestamp': timestamp
-                }
+                }, data.get("spans"))
 
-                # Keep only last 10 screenshots
-                stats["screenshots"].append(screenshot_info)
-                if len(stats["screenshots"]) > 10:
-                    stats["screenshots"].pop(0)
+            elif data["type"] == "analysis":
+                scheduler.complete(data.get("slot"))
+                dispatch_ready(analysis_queue)
+                if session:
+                    session.record_analysis(data)
+
+                trace = data["trace"]
+                mark_dequeued(trace, "server")
+                result = data["result"]
+                if result.get("cancelled"):
+                    # Stopped before the model answered: keep the frame for the session's next start
+                    save_pending(session_id, [data])
+                    metrics.analyses.inc(model=data.get("model", ""), status="cancelled")
+                    trace_writer.write(trace, "cancelled")
+                    continue
+
+                with span(trace, "emit", "server"):
+                    socketio.emit('analysis_result', {
+                        'session_id': session_id,
+                        'screenshot_num': data['screenshot_num'],
+                        'analyze_time': data['analyze_time'],
+                        'success': data["result"]["success"],
+                        'response': data["result"].get("response", ""),
+                        'error': data["result"].get("error", ""),
+                        'trace_id': trace["trace_id"],
+                        'timestamp': timestamp
+                    })
+
+                # Capture-side spans were already observed with the screenshot message
+                status = "success" if result["success"] else "failure"
+                metrics.observe_spans(trace["spans"], exclude_proc="capture")
+                metrics.time_to_emit.observe(trace["spans"][-1]["end"] - trace["spans"][0]["start"])
+                metrics.analyses.inc(model=data.get("model", ""), status=status)
+                if not result["success"]:
+                    metrics.errors.inc(stage="analysis", error_class=result.get("error_class") or "other")
+                trace_writer.write(trace, status)
+
+                # Remember what was on screen; replays re-run old recordings and are not remembered
+                if result["success"] and session and session.config["source"] != "replay":
+                    try:
+                        memory.add_memory(result["response"], speaker=f"screen:{session_id}",
+                                          timestamp=trace["wall_time"] * 1000)
+                    except Exception as e:
+                        print(f"Memory error: {e}")
 
-                socketio.emit('new_screenshot', screenshot_info)
                 socketio.emit('stats_update', get_current_stats())
 
-            elif data["type"] == "analysis":
-                if data["result"]["success"]:
-                    stats["analyses_completed"] += 1
-                    stats["total_analysis_time"] += data["analyze_time"]
-                else:
-                    stats["analyses_failed"] += 1
-
-                socketio.emit('analysis_result', {
-                    'screenshot_num': data['screenshot_num'],
-                    'analyze_time': data['analyze_time'],
-                    'success': data["result"]["success"],
-                    'response': data["result"].get("response", ""),
-                    'error': data["result"].get("error", ""),
-                    'timestamp': timestamp
-                })
-                socketio.emit('stats_update', get_current_stats())
+            elif data["type"] == "worker_state":
+                observed = supervisor.on_worker_state(data)
+                if observed:
+                    action, mode, seconds = observed
+                    socketio.emit('status_update', {
+                        'message': f"⚡ [{session_id}] Capture {'started' if action == 'start' else 'stopped'} "
+                                   f"in {seconds * 1000:.0f}ms ({mode} worker)",
+                        'session_id': session_id,
+                        'timestamp': timestamp
+                    })
 
             elif data["type"] == "error":
+                metrics.errors.inc(stage=data.get("stage", "unknown"), error_class=data.get("error_class") or "other")
                 socketio.emit('error_message', {
                     'message': data['message'],
+                    'session_id': session_id,
                     'timestamp': timestamp
                 })
 
@@ -189,37 +232,248 @@ def monitor_results():
             print(f"Monitor error: {e}")
 
 def get_current_stats():
-    """Get current statistics"""
-    runtime = 0
-    if stats["start_time"]:
-        runtime = time.time() - stats["start_time"]
+    """Get current statistics, aggregated over all sessions with a per-session breakdown"""
+    totals = new_stats()
+    start_times = []
+    with sessions_lock:
+        session_list = list(sessions.values())
+
+    for session in session_list:
+        for key in ("screenshots_taken", "analyses_completed", "analyses_failed", "analyses_cancelled", "total_analysis_time"):
+            totals[key] += session.stats[key]
+        if session.stats["start_time"]:
+            start_times.append(session.stats["start_time"])
+
+    current = summarize_stats(totals, start_time=min(start_times) if start_times else None)
+
+    queues = scheduler.snapshot()
+    current['sessions'] = {}
+    for session in session_list:
+        session_stats = session.get_stats()
+        session_stats['queue'] = queues.get(session.session_id, {})
+        current['sessions'][session.session_id] = session_stats
+    return current
+
+def frame_stored(frame):
+    """Whether a persisted frame can still be analyzed (its file or archived copy exists)"""
+    if frame.get("archive_dir"):
+        return frame_archive.is_archived(os.path.basename(frame["filepath"]), frame["archive_dir"])
+    return os.path.exists(frame["filepath"])
+
+def resume_pending(session_id):
+    """Queue the frames a previous run of this session left unanalyzed, returns how many"""
+    frames = [frame for frame in take_pending(session_id) if frame_stored(frame)]
+    for frame in frames:
+        # Keep the original trace id and capture time, so results and memories line up with the frame
+        trace = new_trace(session_id, frame["screenshot_num"])
+        trace.update(trace_id=frame["trace_id"], wall_time=frame["wall_time"], resumed=True)
+        submit_frame({
+            "session_id": session_id,
+            "screenshot_num": frame["screenshot_num"],
+            "filepath": frame["filepath"],
+            "archive_dir": frame.get("archive_dir"),
+            "trace": trace
+        })
+        dispatch_ready(analysis_queue)  # Fill free slots first, so the quota drops as few as possible
+    if frames:
+        socketio.emit('status_update', {
+            'message': f"♻️ [{session_id}] Resumed {len(frames)} unanalyzed frames from the last stop",
+            'session_id': session_id,
+            'timestamp': datetime.now().strftime("%H:%M:%S")
+        })
+    return len(frames)
+
+def stop_session(session):
+    """Stop capturing for a session and persist its queued frames, returns how many were saved"""
+    if session.remote_sid:
+        socketio.emit('agent_stop', {}, to=session.remote_sid, namespace=AGENT_NAMESPACE)
+    session.stop()
+    pending = scheduler.remove_session(session.session_id)
+    for item in pending:
+        mark_dequeued(item["trace"], "server")
+    return save_pending(session.session_id, pending)
+
+def finish_in_flight(slots, mode=STOP_MODE, deadline=DRAIN_SECONDS):
+    """Drain (wait for results until the deadline) or abort analyses by slot
+
+    Whatever is still running afterwards is cancelled; the workers answer
+    with "cancelled" results, which monitor_results saves for resume.
+    Returns the slots that had to be cancelled.
+    """
+    if mode == "drain":
+        end = time.monotonic() + deadline
+        while time.monotonic() < end and any(scheduler.is_in_flight(slot) for slot in slots):
+            socketio.sleep(0.05)
+    left = [slot for slot in slots if scheduler.is_in_flight(slot)]
+    supervisor.cancel(left)
+    return left
+
+def finish_stop(slots, mode, deadline, label):
+    """Background task of stop_monitoring: settle the stopped sessions' in-flight analyses"""
+    if mode == "drain":
+        socketio.emit('status_update', {
+            'message': f"⏳ {label}: draining {len(slots)} in-flight analyses (up to {deadline:g}s)",
+            'timestamp': datetime.now().strftime("%H:%M:%S")
+        })
+    left = finish_in_flight(slots, mode, deadline)
+    if left:
+        message = f"✂️ {label}: cancelled {len(left)} in-flight analyses, frames saved for resume"
+    else:
+        message = f"✅ {label}: all in-flight analyses finished"
+    socketio.emit('status_update', {'message': message, 'timestamp': datetime.now().strftime("%H:%M:%S")})
+
+def queue_size(queue):
+    """Approximate multiprocessing queue depth, None where qsize is not implemented (macOS)"""
+    if queue is None:
+        return 0
+    try:
+        return queue.qsize()
+    except NotImplementedError:
+        return None
+
+def start_analysis_pool():
+    """Fork the warm worker processes and start the dispatcher if not already running
+
+    Called once at server start; handlers call it too in case the app was
+    started some other way.
+    """
+    global monitor_thread, dispatch_thread, stop_event, frame_queue, analysis_queue, result_queue, trace_writer
+    global summarizer_thread, indexer_thread
+
+    if trace_writer is None:
+        trace_writer = TraceWriter()
+
+    # The summarizer outlives monitoring runs so abstracts catch up after a stop
+    if summarizer_thread is None:
+        summarizer_thread = threading.Thread(target=memory.summarizer_loop, args=(threading.Event(),))
+        summarizer_thread.daemon = True
+        summarizer_thread.start()
+
+    # Embedding new memories off the result thread, so emits never wait on it
+    if indexer_thread is None:
+        indexer_thread = threading.Thread(target=search_index.indexer_loop, args=(threading.Event(),))
+        indexer_thread.daemon = True
+        indexer_thread.start()
+
+    if not supervisor.start():
+        return
+    frame_queue = supervisor.frame_queue
+    analysis_queue = supervisor.analysis_queue
+    result_queue = supervisor.result_queue
+    stop_event = supervisor.stop_event
+
+    # Start monitoring and dispatch threads
+    monitor_thread = threading.Thread(target=monitor_results, args=(result_queue, analysis_queue, stop_event))
+    monitor_thread.daemon = True
+    monitor_thread.start()
 
-    avg_analysis_time = 0
-    if stats["analyses_completed"] > 0:
-        avg_analysis_time = stats["total_analysis_time"] / stats["analyses_completed"]
+    dispatch_thread = threading.Thread(target=dispatch_frames, args=(frame_queue, analysis_queue, stop_event))
+    dispatch_thread.daemon = True
+    dispatch_thread.start()
+
+def stop_analysis_pool(mode=STOP_MODE, deadline=DRAIN_SECONDS):
+    """Tear the worker processes down at server exit (sessions only pause their workers)
+
+    Sessions are stopped and their queued frames persisted first; in-flight
+    analyses are drained or aborted while the result thread still runs, so
+    no worker is terminated mid-request.
+    """
+    global monitor_thread, dispatch_thread
+
+    with sessions_lock:
+        session_list = list(sessions.values())
+    saved = sum(stop_session(session) for session in session_list)
+
+    if stop_event and monitor_thread:
+        slots = scheduler.in_flight_slots()
+        if slots:
+            print(f"⏳ {'Draining' if mode == 'drain' else 'Aborting'} {len(slots)} in-flight analyses...")
+        left = finish_in_flight(slots, mode, deadline)
+        if left:
+            print(f"✂️ Cancelled {len(left)} in-flight analyses, their frames are saved for resume")
+        # Give the result thread a moment to save the cancelled frames
+        end = time.monotonic() + 2
+        while scheduler.in_flight_slots() and time.monotonic() < end:
+            time.sleep(0.05)
+    if saved:
+        print(f"💾 {saved} queued frames saved for resume")
 
-    success_rate = 0
-    total_analyses = stats["analyses_completed"] + stats["analyses_failed"]
-    if total_analyses > 0:
-        success_rate = (stats["analyses_completed"] / total_analyses) * 100
+    if stop_event:
+        stop_event.set()
 
-    return {
-        'screenshots_taken': stats["screenshots_taken"],
-        'analyses_completed': stats["analyses_completed"],
-        'analyses_failed': stats["analyses_failed"],
-        'avg_analysis_time': round(avg_analysis_time, 2),
-        'success_rate': round(success_rate, 1),
-        'runtime': round(runtime, 1)
-    }
+    # Both threads poll with short timeouts, so they notice the stop event quickly
+    for thread in (monitor_thread, dispatch_thread):
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=2)
+    monitor_thread = dispatch_thread = None
+
+    supervisor.shutdown()
+    # Analyses lost with the workers will never complete
+    scheduler.release_all()
 
 @app.route('/')
 def index():
     """Serve the main dashboard"""
     return render_template('dashboard.html')
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    queues = scheduler.snapshot()
+    metrics.session_pending.clear()
+    for session_id, queue in queues.items():
+        metrics.session_pending.set(queue["pending"], session=session_id)
+    metrics.queue_depth.set(sum(q["pending"] for q in queues.values()), queue="scheduler")
+    for name, queue in (("frames", frame_queue), ("analysis", analysis_queue), ("results", result_queue)):
+        depth = queue_size(queue)
+        if depth is not None:  # No sample beats a bogus one
+            metrics.queue_depth.set(depth, queue=name)
+    metrics.in_flight.set(scheduler.in_flight)
+    return Response(metrics.registry.render(), mimetype=metrics.CONTENT_TYPE)
+
+@app.route('/api/today')
+def today_summary():
+    """What did I do today: the day abstract (?hours=1 adds the hourly ones)"""
+    return jsonify(memory.today(include_hours=request.args.get('hours') == '1'))
+
+@app.route('/api/search')
+def search():
+    """Memories similar to ?q=<text> or to ?like=<memory id>, best first (&k= results, default 10)"""
+    query = request.args.get('q', '').strip()
+    try:
+        k = min(max(int(request.args.get('k', 10)), 1), 100)
+        like = int(request.args['like']) if 'like' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'k and like must be integers'}), 400
+    if not query and like is None:
+        return jsonify({'error': 'Pass q=<text> or like=<memory id>'}), 400
+
+    start = time.monotonic()
+    try:
+        results = search_index.search_memories(query, like, k)
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    return jsonify({
+        'results': results,
+        'took_ms': round((time.monotonic() - start) * 1000, 2),
+        'indexed': len(search_index.default_index())
+    })
+
+@app.after_request
+def allow_dashboard_origin(response):
+    """The React dashboard calls the JSON API from another origin"""
+    if request.path.startswith('/api/'):
+        response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
 @app.route('/screenshots/<filename>')
 def screenshot_file(filename):
-    """Serve screenshot files"""
+    """Serve screenshot files, and frames of archive-storage sessions from the frame archive"""
+    if not os.path.exists(os.path.join('screenshots', filename)):
+        try:
+            return Response(frame_archive.archived_png(filename), mimetype='image/png')
+        except KeyError:
+            pass
     return send_from_directory('screenshots', filename)
 
 @socketio.on('connect')
@@ -234,89 +488,280 @@ def handle_connect():
     emit('stats_update', get_current_stats())
 
     # Send recent screenshots
-    for screenshot in stats["screenshots"]:
+    for screenshot in recent_screenshots:
         emit('new_screenshot', screenshot)
 
 @socketio.on('start_monitoring')
 def handle_start_monitoring(data=None):
-    """Start the monitoring process"""
-    global screenshot_process, analysis_process, monitor_thread, stop_event, analysis_queue, result_queue, stats
+    """Start a monitoring session
+
+    Optional data: session_id (default "default") plus any key of
+    sessions.DEFAULT_SESSION_CONFIG (source, monitor, interval, replay_path,
+    replay_speed, weight, max_pending, max_in_flight, ...).
+    """
+    data = data or {}
+    session_id = str(data.get("session_id") or "default")
 
-    if screenshot_process and screenshot_process.is_alive():
-        emit('error_message', {'message': 'Monitoring already running', 'timestamp': datetime.now().strftime("%H:%M:%S")})
+    if data.get("source") == "remote":
+        emit('error_message', {'message': 'Remote sessions are started by their capture agent', 'timestamp': datetime.now().strftime("%H:%M:%S")})
         return
 
-    # Reset stats
-    stats = {
-        "screenshots_taken": 0,
-        "analyses_completed": 0,
-        "analyses_failed": 0,
-        "total_analysis_time": 0,
-        "start_time": time.time(),
-        "screenshots": []
-    }
+    with sessions_lock:
+        session = sessions.get(session_id)
+        if session and session.is_alive():
+            emit('error_message', {'message': f'Session {session_id} already running', 'timestamp': datetime.now().strftime("%H:%M:%S")})
+            return
+
+        try:
+            session = MonitoringSession(session_id, data)
+        except ValueError as e:
+            emit('error_message', {'message': f'Invalid session config: {e}', 'timestamp': datetime.now().strftime("%H:%M:%S")})
+            return
+        sessions[session_id] = session
 
     # Create screenshots directory
     os.makedirs("screenshots", exist_ok=True)
 
-    # Setup queues and events
-    analysis_queue = multiprocessing.Queue()
-    result_queue = multiprocessing.Queue()
-    stop_event = multiprocessing.Event()
-
-    # Start processes
-    screenshot_process = multiprocessing.Process(
-        target=screenshot_worker,
-        args=(analysis_queue, result_queue, stop_event)
+    start_analysis_pool()
+    scheduler.add_session(
+        session_id,
+        weight=session.config["weight"],
+        max_pending=session.config["max_pending"],
+        max_in_flight=session.config["max_in_flight"]
     )
-    screenshot_process.start()
+    session.start(supervisor)
+    resume_pending(session_id)
 
-    analysis_process = multiprocessing.Process(
-        target=analysis_worker,
-        args=(analysis_queue, result_queue, stop_event)
-    )
-    analysis_process.start()
-
-    # Start monitoring thread
-    monitor_thread = threading.Thread(target=monitor_results)
-    monitor_thread.daemon = True
-    monitor_thread.start()
+    if session.config["source"] == "replay":
+        speed = session.config["replay_speed"]
+        source_info = f'replaying {session.config["replay_path"]} at {f"{speed:g}x" if speed else "max speed"}'
+    else:
+        source_info = f'monitor {session.config["monitor"]}'
 
     emit('status_update', {
-        'message': '🚀 Live monitoring started!',
+        'message': f'🚀 Live monitoring started! (session {session_id}, {source_info})',
+        'session_id': session_id,
         'timestamp': datetime.now().strftime("%H:%M:%S")
     })
 
 @socketio.on('stop_monitoring')
 def handle_stop_monitoring(data=None):
-    """Stop the monitoring process"""
-    global screenshot_process, analysis_process, stop_event, analysis_queue
+    """Stop one session (data.session_id) or every session
+
+    Optional data: mode "drain" (default STOP_MODE) lets in-flight analyses
+    finish for up to deadline seconds (default DRAIN_SECONDS), "abort"
+    cancels them right away. The handler returns at once either way.
+    """
+    data = data or {}
+    session_id = data.get("session_id")
+    mode = data.get("mode") or STOP_MODE
+    if mode not in STOP_MODES:
+        emit('error_message', {'message': f'Unknown stop mode {mode!r} (use drain or abort)', 'timestamp': datetime.now().strftime("%H:%M:%S")})
+        return
+    try:
+        deadline = float(data.get("deadline", DRAIN_SECONDS))
+    except (TypeError, ValueError):
+        emit('error_message', {'message': 'deadline must be a number of seconds', 'timestamp': datetime.now().strftime("%H:%M:%S")})
+        return
 
-    if stop_event:
-        stop_event.set()
+    with sessions_lock:
+        if session_id is not None:
+            to_stop = [sessions[session_id]] if session_id in sessions else []
+        else:
+            to_stop = list(sessions.values())
+
+    saved = 0
+    slots = []
+    for session in to_stop:
+        saved += stop_session(session)
+        slots += scheduler.in_flight_slots(session.session_id)
 
-    if analysis_queue:
-        analysis_queue.put(None)  # Poison pill
+    label = '🛑 Monitoring stopped' if session_id is None else f'🛑 Session {session_id} stopped'
+    emit('status_update', {
+        'message': label + (f" ({saved} queued frames saved for resume)" if saved else ""),
+        'session_id': session_id,
+        'timestamp': datetime.now().strftime("%H:%M:%S")
+    })
+    if slots:
+        socketio.start_background_task(finish_stop, slots, mode, deadline,
+                                       'Monitoring' if session_id is None else f'Session {session_id}')
+
+def agent_authorized(token):
+    """Agents must present the shared AGENT_TOKEN; with no token configured none are accepted"""
+    if not AGENT_TOKEN or not isinstance(token, str):
+        return False
+    return hmac.compare_digest(token.encode(), AGENT_TOKEN.encode())
+
+@socketio.on('connect', namespace=AGENT_NAMESPACE)
+def handle_agent_connect(auth=None):
+    """Refuse agent connections without the shared token"""
+    token = auth.get("token") if isinstance(auth, dict) else None
+    if not agent_authorized(token):
+        print(f"Rejected capture agent {request.sid}: missing or invalid token")
+        return False
+
+@socketio.on('agent_hello', namespace=AGENT_NAMESPACE)
+def handle_agent_hello(data=None):
+    """Register a remote capture agent as a session (again after a reconnect)
+
+    data: agent_id and token plus optional weight, max_pending and max_in_flight.
+    """
+    data = data if isinstance(data, dict) else {}
+    if not agent_authorized(data.get("token")):
+        return {'ok': False, 'error': 'Invalid agent token'}
+    session_id = re.sub(r'[^A-Za-z0-9_-]', '_', str(data.get("agent_id") or request.sid))
+
+    with sessions_lock:
+        session = sessions.get(session_id)
+        if session and not session.is_remote:
+            return {'ok': False, 'error': f'Session {session_id} is a local session'}
+
+        # A reconnecting agent keeps its session and stats
+        reconnect = session is not None
+        if not reconnect:
+            try:
+                session = MonitoringSession(session_id, dict(data, source="remote"))
+            except ValueError as e:
+                return {'ok': False, 'error': f'Invalid session config: {e}'}
+            sessions[session_id] = session
+        if session.remote_sid:
+            agent_sids.pop(session.remote_sid, None)
+        session.remote_sid = request.sid
+        agent_sids[request.sid] = session_id
 
-    # Wait for processes to finish
-    if screenshot_process:
-        screenshot_process.join(timeout=2)
-        if screenshot_process.is_alive():
-            screenshot_process.terminate()
-            screenshot_process.join()
+    os.makedirs("screenshots", exist_ok=True)
+    start_analysis_pool()
+    scheduler.add_session(
+        session_id,
+        weight=session.config["weight"],
+        max_pending=session.config["max_pending"],
+        max_in_flight=session.config["max_in_flight"]
+    )
+    if not reconnect:
+        session.start(supervisor)
+    # Also after a stop: the agent comes back with the same id and picks up its saved frames
+    resume_pending(session_id)
+
+    socketio.emit('status_update', {
+        'message': f'🛰️ Capture agent {session_id} {"reconnected" if reconnect else "connected"}',
+        'session_id': session_id,
+        'timestamp': datetime.now().strftime("%H:%M:%S")
+    })
+    return {'ok': True, 'session_id': session_id, 'max_pending': session.config["max_pending"],
+            'max_frame_bytes': MAX_FRAME_BYTES}
 
-    if analysis_process:
-        analysis_process.join(timeout=2)
-        if analysis_process.is_alive():
-            analysis_process.terminate()
-            analysis_process.join()
+@socketio.on('agent_frame', namespace=AGENT_NAMESPACE)
+def handle_agent_frame(data=None):
+    """Store an encoded frame pushed by an agent and queue it for analysis
 
-    emit('status_update', {
-        'message': '🛑 Monitoring stopped',
+    The frame arrives as a binary attachment and is written and analyzed
+    without being decoded. The return value is the agent's backpressure ack,
+    {'ok': False, 'error': ...} whenever the frame could not be taken.
+    """
+    try:
+        return receive_agent_frame(data)
+    except Exception as e:
+        metrics.errors.inc(stage="agent", error_class=classify_error(e))
+        return {'ok': False, 'error': str(e)}
+
+def parse_agent_frame(data):
+    """Validate an agent_frame payload, raising ValueError for anything malformed"""
+    if not isinstance(data, dict):
+        raise ValueError("Frame payload must be an object")
+
+    image = data.get("image")
+    if not isinstance(image, (bytes, bytearray)):
+        raise ValueError("image must be a binary attachment")
+    if len(image) > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {len(image) / 1024 / 1024:.2f}MB is over the {MAX_FRAME_BYTES / 1024 / 1024:g}MB limit (MAX_FRAME_MB)")
+    try:
+        # Also keeps the number safe to use in the file name
+        screenshot_num = int(data.get("screenshot_num"))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("screenshot_num must be an integer")
+    if screenshot_num < 0:
+        raise ValueError("screenshot_num must not be negative")
+
+    timings = data.get("timings") or {}
+    if not isinstance(timings, dict):
+        raise ValueError("timings must be an object")
+    timings = {stage: float(timings[stage]) for stage in AGENT_STAGES if stage in timings}
+
+    baseline = data.get("baseline")
+    if baseline is not None:
+        if not isinstance(baseline, dict):
+            raise ValueError("baseline must be an object")
+        baseline = {"png_bytes": int(baseline["png_bytes"]), "json_bytes": int(baseline["json_bytes"])}
+
+    return bytes(image), screenshot_num, timings, baseline
+
+def receive_agent_frame(data):
+    """Write, publish and schedule one agent frame; errors propagate to handle_agent_frame"""
+    session_id = agent_sids.get(request.sid)
+    session = sessions.get(session_id)
+    if session is None or not session.is_alive():
+        return {'ok': False, 'error': 'Send agent_hello first'}
+
+    image, screenshot_num, timings, baseline = parse_agent_frame(data)
+    extension = IMAGE_EXTENSIONS[encoded_image_mime_type(image)]
+
+    # Agent clocks are not comparable with ours, so agent-side stages are durations only
+    trace = new_trace(session_id, screenshot_num)
+    trace["agent_timings"] = timings
+    for stage, seconds in timings.items():
+        metrics.stage_latency.observe(seconds, stage=f"agent_{stage}")
+
+    filename = f"remote_{session_id}_{int(time.time())}_{screenshot_num}.{extension}"
+    filepath = f"screenshots/{filename}"
+    with span(trace, "save", "capture"):  # Capture-side spans are observed by publish_screenshot
+        with open(filepath, 'wb') as f:
+            f.write(image)
+
+    session.record_remote_frame(len(image), baseline)
+    metrics.agent_bytes.inc(len(image), agent=session_id)
+    publish_screenshot(session_id, {
+        'num': screenshot_num,
+        'session_id': session_id,
+        'filename': filename,
+        'filepath': filepath,
+        'size_kb': len(image) / 1024,
         'timestamp': datetime.now().strftime("%H:%M:%S")
+    }, trace["spans"])
+
+    dropped = submit_frame({
+        "session_id": session_id,
+        "screenshot_num": screenshot_num,
+        "filepath": filepath,
+        "trace": trace
     })
+    dispatch_ready(analysis_queue)
+
+    queue = scheduler.snapshot().get(session_id, {})
+    return {
+        'ok': True,
+        'dropped': dropped,
+        'pending': queue.get("pending", 0),
+        'max_pending': session.config["max_pending"]
+    }
+
+@socketio.on('disconnect', namespace=AGENT_NAMESPACE)
+def handle_agent_disconnect(*args):
+    """Mark the agent's session as disconnected; it resumes when the agent reconnects"""
+    session_id = agent_sids.pop(request.sid, None)
+    session = sessions.get(session_id)
+    if session and session.remote_sid == request.sid:
+        session.remote_sid = None
+        socketio.emit('status_update', {
+            'message': f'📴 Capture agent {session_id} disconnected',
+            'session_id': session_id,
+            'timestamp': datetime.now().strftime("%H:%M:%S")
+        })
 
 if __name__ == '__main__':
     print("🌐 Starting Live Screen Analysis Dashboard...")
     print("📱 Open your browser to: http://localhost:8080")
-    socketio.run(app, host='0.0.0.0', port=8080, debug=False)
\ No newline at end of file
+    start_analysis_pool()  # Pre-fork the workers so the first session starts warm
+    try:
+        socketio.run(app, host='0.0.0.0', port=8080, debug=False)
+    finally:
+        stop_analysis_pool()
\ No newline at end of file
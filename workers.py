@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Capture and analysis worker processes
+Used by the web dashboard (through supervisor.py) and by the headless replay
+runner (replay.py)
+"""
+
+import os
+import time
+import threading
+import mss
+from queue import Empty
+from datetime import datetime
+from utils import resize_to_1536x864, analyze_screenshot_with_model, save_screenshot, classify_error, abort_http_requests
+from frame_sources import make_frame_source
+from frame_archive import ArchiveWriter, ARCHIVE_DIR, archived_png
+from tracing import new_trace, add_span, span, mark_enqueued, mark_dequeued
+
+DEFAULT_MODEL = os.getenv('ANALYSIS_MODEL', "google/gemini-2.0-flash-exp:free")
+
+class AnalysisCancelled(Exception):
+    """The supervisor cancelled an analysis while it was running"""
+
+def is_cancelled(cancelled, slot):
+    """True if a scheduler slot is in the shared array of cancelled slots"""
+    if cancelled is None or slot is None:
+        return False
+    with cancelled.get_lock():
+        return slot in cancelled[:]
+
+def run_cancellable(function, args, cancel_check, poll=0.05):
+    """Run function in a thread, raising AnalysisCancelled as soon as cancel_check() is true
+
+    A cancelled call is abandoned rather than interrupted: the worker moves on
+    at once and the thread's late result is discarded. The caller closes the
+    call's HTTP connection (utils.abort_http_requests), so the request itself
+    stops too.
+    """
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = function(*args)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    while thread.is_alive():
+        thread.join(poll)
+        if thread.is_alive() and cancel_check():
+            raise AnalysisCancelled("Analysis cancelled")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+def load_frame(data):
+    """Encoded bytes of a queued frame, from its file or, for archive storage, from the archive"""
+    if data.get("archive_dir"):
+        return archived_png(os.path.basename(data["filepath"]), data["archive_dir"])
+    with open(data["filepath"], 'rb') as f:
+        return f.read()
+
+def analysis_worker(analysis_queue, result_queue, stop_event, model=DEFAULT_MODEL, cancelled=None):
+    """Worker process that handles AI analysis for every session
+
+    With a shared `cancelled` array of scheduler slots (see supervisor.py)
+    the model call can be cancelled while it runs.
+    """
+    while not stop_event.is_set():
+        try:
+            data = analysis_queue.get(timeout=1.0)
+            if data is None:  # Poison pill
+                break
+
+            screenshot_num = data["screenshot_num"]
+            trace = data["trace"]
+            mark_dequeued(trace, "analysis")
+
+            # Analyze screenshot - failures still produce a result so the scheduler slot is released
+            analyze_start = time.time()
+            slot = data.get("slot")
+            try:
+                if is_cancelled(cancelled, slot):
+                    raise AnalysisCancelled("Analysis cancelled before it started")
+                # Frames travel as file paths; the stored PNG/WebP/JPEG bytes go to the model as-is
+                with span(trace, "load", "analysis"):
+                    screenshot = load_frame(data)
+                if cancelled is None:
+                    result = analyze_screenshot_with_model(screenshot, screenshot_num, model=model)
+                else:
+                    result = run_cancellable(analyze_screenshot_with_model, (screenshot, screenshot_num, model),
+                                             lambda: is_cancelled(cancelled, slot))
+            except AnalysisCancelled as e:
+                abort_http_requests()  # Close the abandoned request's connection so it stops at once
+                result = {"success": False, "time": time.time() - analyze_start, "response": None,
+                          "error": str(e), "error_class": "cancelled", "cancelled": True, "timings": {}}
+            except Exception as e:
+                result = {"success": False, "time": time.time() - analyze_start, "response": None,
+                          "error": str(e), "error_class": classify_error(e), "timings": {}}
+            analyze_time = time.time() - analyze_start
+            for stage, (start, end) in result.get("timings", {}).items():
+                add_span(trace, stage, start, end, "analysis")
+
+            # Send analysis result
+            mark_enqueued(trace, "result_queue")
+            result_queue.put({
+                "type": "analysis",
+                "session_id": data["session_id"],
+                "slot": slot,
+                "screenshot_num": screenshot_num,
+                "filepath": data["filepath"],
+                "archive_dir": data.get("archive_dir"),
+                "model": model,
+                "analyze_time": analyze_time,
+                "trace": trace,
+                "result": result,
+                "timestamp": datetime.now().strftime("%H:%M:%S")
+            })
+
+        except Empty:
+            continue  # Idle pool, not an error
+        except Exception as e:
+            if not stop_event.is_set():
+                result_queue.put({
+                    "type": "error",
+                    "stage": "analysis",
+                    "error_class": classify_error(e),
+                    "message": f"Analysis worker error: {str(e)}",
+                    "timestamp": datetime.now().strftime("%H:%M:%S")
+                })
+
+def screenshot_worker(session_id, config, frame_queue, result_queue, stop_event, capturer=None):
+    """Worker process that captures screenshots for one session from its frame source"""
+    source_kind = config.get("source", "live")
+    prefix = source_kind if session_id == "default" else f"{source_kind}_{session_id}"
+    screenshot_dir = config.get("screenshot_dir", "screenshots")
+    archive_dir = config.get("archive_dir", ARCHIVE_DIR) if config.get("storage") == "archive" else None
+    archive = None
+
+    try:
+        source = make_frame_source(config, capturer)
+        if archive_dir:
+            # Frames are only written to the archive; analysis reads them back from it
+            archive = ArchiveWriter(archive_dir, prefix)
+        screenshot_count = 0
+
+        while not stop_event.is_set():
+            # Block until the source has the next frame due (interval or replay timing)
+            if not source.wait(stop_event):
+                break
+            if source.finished:
+                result_queue.put({
+                    "type": "status",
+                    "session_id": session_id,
+                    "finished": True,
+                    "message": f"🏁 [{session_id}] Replay finished after {screenshot_count} frames",
+                    "timestamp": datetime.now().strftime("%H:%M:%S")
+                })
+                break
+            screenshot_count += 1
+
+            # Send status update
+            result_queue.put({
+                "type": "status",
+                "session_id": session_id,
+                "message": f"📸 [{session_id}] Capturing screenshot #{screenshot_count}...",
+                "timestamp": datetime.now().strftime("%H:%M:%S")
+            })
+
+            # Capture and process screenshot, tracing each stage
+            trace = new_trace(session_id, screenshot_count)
+            with span(trace, "capture", "capture"):
+                screenshot = source.grab()
+            with span(trace, "resize", "capture"):
+                resized_screenshot = resize_to_1536x864(screenshot)
+
+            # Save screenshot
+            timestamp = int(time.time())
+            filename = f"{prefix}_{timestamp}_{screenshot_count}.png"
+            filepath = f"{screenshot_dir}/{filename}"
+            if archive:
+                with span(trace, "archive", "capture"):
+                    record = archive.add(resized_screenshot, timestamp=trace["wall_time"] * 1000, name=filename)
+                file_size_kb = record["bytes"] / 1024
+            else:
+                with span(trace, "save", "capture"):
+                    file_size_kb = save_screenshot(resized_screenshot, filepath)
+
+            # Send capture complete update
+            result_queue.put({
+                "type": "screenshot",
+                "session_id": session_id,
+                "screenshot_num": screenshot_count,
+                "filename": filename,
+                "filepath": filepath,
+                "file_size_kb": file_size_kb,
+                "trace_id": trace["trace_id"],
+                "spans": list(trace["spans"]),
+                "timestamp": datetime.now().strftime("%H:%M:%S")
+            })
+
+            # Hand the saved frame to the shared scheduler by path, not by pickled image
+            mark_enqueued(trace, "frame_queue")
+            frame_queue.put({
+                "session_id": session_id,
+                "screenshot_num": screenshot_count,
+                "filepath": filepath,
+                "archive_dir": archive_dir,
+                "trace": trace
+            })
+
+        source.close()
+
+    except Exception as e:
+        result_queue.put({
+            "type": "error",
+            "session_id": session_id,
+            "stage": "capture",
+            "error_class": classify_error(e),
+            "message": f"Screenshot worker error ({session_id}): {str(e)}",
+            "timestamp": datetime.now().strftime("%H:%M:%S")
+        })
+    finally:
+        if archive:
+            archive.close()
+
+class AssignmentStop:
+    """Stop event of one assignment on a warm capture worker
+
+    The supervisor stops an assignment by moving the worker's shared
+    generation number on and setting its wake event, without waiting.
+    """
+
+    def __init__(self, generation, wake, assigned):
+        self.generation = generation
+        self.wake = wake
+        self.assigned = assigned
+
+    def is_set(self):
+        return self.generation.value != self.assigned
+
+    def wait(self, timeout=None):
+        self.wake.wait(timeout)
+        return self.is_set()
+
+def capture_worker(worker_id, control_queue, generation, wake, frame_queue, result_queue):
+    """Warm capture process: runs capture assignments from the supervisor until sent None
+
+    Modules stay imported and the mss capturer stays open between
+    assignments, so starting a session costs one queue message.
+    """
+    capturer = None
+    while True:
+        command = control_queue.get()
+        if command is None:
+            break
+        wake.clear()
+        stop = AssignmentStop(generation, wake, command["generation"])
+        session_id = command["session_id"]
+        config = command["config"]
+
+        if config.get("source", "live") == "live" and capturer is None:
+            try:
+                capturer = mss.mss()
+            except Exception:
+                capturer = None  # Headless box: screenshot_worker reports the capture error
+
+        if not stop.is_set():
+            result_queue.put({"type": "worker_state", "worker_id": worker_id, "session_id": session_id,
+                              "generation": command["generation"], "state": "running", "at": time.monotonic()})
+            screenshot_worker(session_id, config, frame_queue, result_queue, stop, capturer)
+
+        # An assignment that ended by itself (replay finished, capture error) frees the worker
+        with generation.get_lock():
+            if generation.value == command["generation"]:
+                generation.value = 0
+        result_queue.put({"type": "worker_state", "worker_id": worker_id, "session_id": session_id,
+                          "generation": command["generation"], "state": "idle", "at": time.monotonic()})